@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from . import schemas, crud_async
+from .database import get_async_db
+from .dependencies import get_current_user_async, get_current_user_id_async
+
+# Async variants of the hot routes in main.py. main includes this router ahead of its own
+# routes when USE_ASYNC_DB is on, so these take precedence for the same method and path.
+router = APIRouter()
+
+# --- User Routes ---
+@router.get("/me", response_model=schemas.User)
+async def read_current_user_profile(db: AsyncSession = Depends(get_async_db), current_user: schemas.Principal = Depends(get_current_user_async)):
+    """Get the current authenticated user's profile details."""
+    return await crud_async.get_user_by_id(db, user_id=current_user.id)
+
+@router.get("/users/{user_id}", response_model=schemas.User)
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get a specific user by ID."""
+    db_user = await crud_async.get_user_by_id(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return db_user
+
+# --- Group Member Routes ---
+@router.get("/groups/{group_id}/members", response_model=List[schemas.GroupMember])
+async def get_group_members(
+    group_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.Principal = Depends(get_current_user_async)
+):
+    """Get all members of a group (requires membership)."""
+    if await crud_async.get_group_by_id(db, group_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+    if await crud_async.get_group_member_record(db, group_id=group_id, user_id=current_user.id) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not a member of this group")
+
+    return await crud_async.get_group_members(db, group_id=group_id)
+
+# --- Expense Routes ---
+@router.post("/expenses/", response_model=schemas.Expense, status_code=status.HTTP_201_CREATED)
+async def create_expense_route(
+    expense: schemas.ExpenseCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id_async)
+):
+    """Create a new expense in a group."""
+    if await crud_async.get_group_by_id(db, expense.group_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+
+    try:
+        return await crud_async.create_expense(db=db, expense=expense, current_user_id=current_user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+# --- Balance Routes ---
+@router.get("/groups/{group_id}/balances", response_model=schemas.GroupBalance)
+async def get_group_balances(
+    group_id: int,
+    minimize_transactions: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.Principal = Depends(get_current_user_async)
+):
+    """Calculate the simplified net balances for a group (who owes whom)."""
+    if await crud_async.get_group_by_id(db, group_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+
+    balances = await crud_async.simplify_balances(db, group_id, minimize_transactions=minimize_transactions)
+    return schemas.GroupBalance(group_id=group_id, balances=balances)
@@ -0,0 +1,143 @@
+"""
+Audit trail pipeline. crud code calls record() inside its transaction; nothing is written
+then. The queued rows go out in one multi-row INSERT, at a point set by AUDIT_DURABILITY:
+
+  - transaction (default): just before that transaction commits, so the audit rows commit
+    or roll back together with the change they describe.
+  - eventual: after it commits, from a background writer that batches rows from many
+    requests. The request never waits on the audit insert. Rows still queued when the
+    process dies are lost, and their timestamp is the time of the write, not the change.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .metrics import registry
+
+AUDIT_DURABILITY = os.environ.get("AUDIT_DURABILITY", "transaction").lower()
+if AUDIT_DURABILITY not in ("transaction", "eventual"):
+    raise ValueError(f"AUDIT_DURABILITY must be 'transaction' or 'eventual', not {AUDIT_DURABILITY!r}")
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "500")) # most rows per background INSERT
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ROWS_WRITTEN = registry.counter("audit_rows_written_total", "Audit trail rows inserted")
+
+_PENDING = "pending_audit_rows" # key in Session.info
+
+def record(
+    db,
+    group_id: Optional[int],
+    user_id: int,
+    action: str,
+    expense_id: Optional[int] = None,
+    recurring_expense_id: Optional[int] = None,
+    old_value: Any = None,
+    new_value: Any = None
+):
+    """Queues an audit row on the session's current transaction. old_value and new_value are stored as JSON."""
+    session = getattr(db, "sync_session", db) # an AsyncSession queues on the Session it wraps
+    if not session.in_transaction():
+        session.begin() # so a rollback before any other statement still discards the row
+    session.info.setdefault(_PENDING, []).append({
+        "group_id": group_id,
+        "user_id": user_id,
+        "action": action,
+        "expense_id": expense_id,
+        "recurring_expense_id": recurring_expense_id,
+        "old_value": old_value,
+        "new_value": new_value,
+    })
+
+class AuditWriter:
+    """
+    Background thread that inserts audit rows handed over after commit. Each INSERT takes
+    everything queued at that moment (up to AUDIT_BATCH_SIZE), so batches grow with load.
+    """
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, rows: List[Dict[str, Any]]):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+        for row in rows:
+            self._queue.put(row)
+
+    def flush(self):
+        """Blocks until every row submitted so far has been written (or dropped)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(models.AuditTrail.__table__), batch)
+            db.commit()
+            AUDIT_ROWS_WRITTEN.inc(len(batch))
+        except Exception:
+            # e.g. the expense a row points at was deleted meanwhile; keep the rows that still fit
+            db.rollback()
+            logger.exception("Audit batch of %d rows failed; retrying one by one", len(batch))
+            for row in batch:
+                try:
+                    db.execute(insert(models.AuditTrail.__table__), [row])
+                    db.commit()
+                    AUDIT_ROWS_WRITTEN.inc()
+                except Exception:
+                    db.rollback()
+                    logger.error("Dropped audit row %r", row)
+        finally:
+            db.close()
+
+writer = AuditWriter()
+atexit.register(writer.flush)
+
+@event.listens_for(Session, "before_commit")
+def _write_with_transaction(session: Session):
+    if AUDIT_DURABILITY == "transaction":
+        rows = session.info.pop(_PENDING, None)
+        if rows:
+            session.execute(insert(models.AuditTrail.__table__), rows)
+            AUDIT_ROWS_WRITTEN.inc(len(rows)) # counted once the INSERT ran, even if the commit then fails
+
+@event.listens_for(Session, "after_commit")
+def _hand_to_writer(session: Session):
+    if AUDIT_DURABILITY == "eventual":
+        rows = session.info.pop(_PENDING, None)
+        if rows:
+            writer.submit(rows)
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_uncommitted(session: Session, transaction):
+    # Rows of a transaction that rolled back (or was closed) describe changes that never happened
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
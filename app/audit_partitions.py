@@ -0,0 +1,160 @@
+"""
+Upkeep of the monthly audit_trail partitions on PostgreSQL (migration 0005).
+
+Creates the partitions for the coming months, and applies the retention policy by removing
+whole partitions rather than DELETEing rows, so the hot partitions and their indexes stay
+small and vacuum never has to clean up after a mass delete. Once a month's partition
+exists, rows for it no longer land in the DEFAULT partition; any that did are moved over.
+
+The app creates missing future partitions at startup; run this daily (e.g. from cron) to
+keep them coming and to apply retention:
+    python -m app.audit_partitions
+
+Does nothing on other databases or on an audit_trail that is not partitioned.
+"""
+import datetime
+import gzip
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .database import engine
+
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.environ.get("AUDIT_PARTITION_MONTHS_AHEAD", "3"))
+AUDIT_RETENTION_MONTHS = int(os.environ.get("AUDIT_RETENTION_MONTHS", "0")) # whole months kept before the current one; 0 keeps everything
+# What happens to a partition past retention: detach (keep it as a standalone table),
+# drop, or archive (COPY it to AUDIT_ARCHIVE_DIR/<partition>.csv.gz, then drop)
+AUDIT_RETENTION_ACTION = os.environ.get("AUDIT_RETENTION_ACTION", "detach").lower()
+AUDIT_ARCHIVE_DIR = os.environ.get("AUDIT_ARCHIVE_DIR", "audit-archive")
+
+PARENT = "audit_trail"
+DEFAULT_PARTITION = "audit_trail_default"
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+def add_months(month_start: datetime.date, months: int) -> datetime.date:
+    year, month_index = divmod(month_start.month - 1 + months, 12)
+    return datetime.date(month_start.year + year, month_index + 1, 1)
+
+def partition_name(month_start: datetime.date) -> str:
+    return f"{PARENT}_p{month_start:%Y%m}"
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:parent)"), {"parent": PARENT}
+    ).first() is not None
+
+def list_partitions(conn: Connection) -> List[Tuple[str, Optional[datetime.datetime]]]:
+    """(name, exclusive upper bound) of every partition, oldest first; the DEFAULT partition has no bound."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:parent)"
+    ), {"parent": PARENT})
+    partitions = []
+    for name, bound in rows:
+        match = _UPPER_BOUND.search(bound)
+        partitions.append((name, datetime.datetime.fromisoformat(match.group(1)) if match else None))
+    return sorted(partitions, key=lambda p: (p[1] is None, p[1] or datetime.datetime.max))
+
+def _lock(conn: Connection):
+    """Serializes maintenance runs (several app workers start at once) until the transaction ends."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"{PARENT}_partitions"})
+
+def create_future_partitions(conn: Connection, months_ahead: int = AUDIT_PARTITION_MONTHS_AHEAD,
+                             today: Optional[datetime.date] = None) -> List[str]:
+    """
+    Creates the monthly partitions up to months_ahead months past the current one,
+    starting where the existing ranges end so a lapse in maintenance leaves no gap.
+    Returns the names created.
+    """
+    _lock(conn)
+    partitions = list_partitions(conn)
+    bounds = [upper for _, upper in partitions if upper is not None]
+    this_month = (today or datetime.date.today()).replace(day=1)
+    month = max(bounds).date() if bounds else this_month
+    last = add_months(this_month, months_ahead)
+    has_default = any(name == DEFAULT_PARTITION for name, _ in partitions)
+
+    created = []
+    while month <= last:
+        name, start, end = partition_name(month), month, add_months(month, 1)
+        bound = {"start": start, "end": end}
+        stray = has_default and conn.execute(text(
+            f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end LIMIT 1'
+        ), bound).first()
+        if stray:
+            # A new partition may not overlap rows in DEFAULT; move them over while it is detached
+            conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES FROM ('{start}') TO ('{end}')"))
+            conn.execute(text(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end RETURNING *) '
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), bound)
+            conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        else:
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES FROM ('{start}') TO ('{end}')"))
+        created.append(name)
+        month = end
+    return created
+
+def _archive(conn: Connection, name: str, archive_dir: str) -> str:
+    """Writes a detached partition to <archive_dir>/<name>.csv.gz; returns the path."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + ".partial"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        with gzip.open(partial, "wb") as archive:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    finally:
+        cursor.close()
+    os.replace(partial, path) # only a complete file ever carries the final name
+    return path
+
+def apply_retention(conn: Connection, retention_months: int = AUDIT_RETENTION_MONTHS,
+                    action: str = AUDIT_RETENTION_ACTION, archive_dir: str = AUDIT_ARCHIVE_DIR,
+                    today: Optional[datetime.date] = None) -> List[str]:
+    """
+    Detaches every partition whose rows all predate the retention window, then keeps,
+    drops or archives it according to action. Returns the names removed from audit_trail.
+    """
+    if retention_months <= 0:
+        return []
+    if action not in ("detach", "drop", "archive"):
+        raise ValueError(f"AUDIT_RETENTION_ACTION must be detach, drop or archive, not {action!r}")
+
+    _lock(conn)
+    cutoff = datetime.datetime.combine(add_months((today or datetime.date.today()).replace(day=1), -retention_months), datetime.time())
+    removed = []
+    for name, upper in list_partitions(conn):
+        if upper is None or upper > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if action == "archive":
+            _archive(conn, name, archive_dir)
+        if action in ("drop", "archive"):
+            conn.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+    return removed
+
+def maintain_partitions(retention: bool = True) -> Dict[str, List[str]]:
+    """Creates future partitions and, with retention, applies the retention policy; one transaction each."""
+    result: Dict[str, List[str]] = {"created": [], "removed": []}
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return result
+        result["created"] = create_future_partitions(conn)
+    if retention:
+        with engine.begin() as conn:
+            result["removed"] = apply_retention(conn)
+    return result
+
+if __name__ == "__main__":
+    outcome = maintain_partitions()
+    print(f"Created partitions: {', '.join(outcome['created']) or 'none'}")
+    print(f"Removed partitions ({AUDIT_RETENTION_ACTION}): {', '.join(outcome['removed']) or 'none'}")
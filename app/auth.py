@@ -1,19 +1,50 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from . import schemas, crud, database
+from .metrics import registry
 from .models import User 
 
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; stored hashes with any other cost are rehashed on the next successful login
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# bcrypt releases the GIL, so hashing runs on a dedicated bounded pool: it never blocks
+# the event loop and at most PASSWORD_HASH_WORKERS cores are spent on logins at once
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# Resolved principals are cached per token to skip jwt.decode and the user SELECT
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+# The TTL is how long another worker may keep serving a deactivated user; keep it short
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+PASSWORD_VERIFY_SECONDS = registry.histogram(
+    "password_verify_duration_seconds", "bcrypt verification time, not counting the wait for a hash worker",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 # def verify_password(plain_password, hashed_password):
 #     return pwd_context.verify(plain_password, hashed_password)
@@ -43,15 +74,52 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 #             headers={"WWW-Authenticate": "Bearer"},
 #         )
 #     return True
+def _timed(verify):
+    """Wraps a pwd_context verify method to observe PASSWORD_VERIFY_SECONDS on the hash worker."""
+    def timed_verify(plain_password, hashed_password):
+        start = time.perf_counter()
+        try:
+            return verify(plain_password, hashed_password)
+        finally:
+            PASSWORD_VERIFY_SECONDS.observe(time.perf_counter() - start)
+    return timed_verify
+
+_verify = _timed(pwd_context.verify)
+_verify_and_update = _timed(pwd_context.verify_and_update)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Checks if the provided plain password matches the hashed password.
     NOTE: This utility function should return a boolean, not raise an HTTPException.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return _hash_executor.submit(_verify, plain_password, hashed_password).result()
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _hash_executor.submit(pwd_context.hash, password).result()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Awaitable verify_password for async routes; the event loop stays free while bcrypt runs."""
+    return await asyncio.wrap_future(_hash_executor.submit(_verify, plain_password, hashed_password))
+
+async def get_password_hash_async(password: str) -> str:
+    return await asyncio.wrap_future(_hash_executor.submit(pwd_context.hash, password))
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and, if the stored hash uses outdated parameters, returns a
+    replacement hash computed with the current ones (otherwise None).
+    """
+    return _hash_executor.submit(_verify_and_update, plain_password, hashed_password).result()
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await asyncio.wrap_future(
+        _hash_executor.submit(_verify_and_update, plain_password, hashed_password)
+    )
+
+def _upgrade_password_hash(db: Session, user: User, new_hash: str):
+    """Stores a rehashed password after a successful login."""
+    user.hashed_password = new_hash
+    db.commit()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -71,6 +139,71 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class PrincipalCache:
+    """
+    Bounded LRU cache mapping an access token to its resolved schemas.Principal.
+
+    Entries expire after PRINCIPAL_CACHE_TTL_SECONDS or when the token itself expires,
+    whichever comes first. The cache is per process, so invalidate_user only affects
+    the worker that calls it: a principal another worker cached as active stays active
+    there for up to PRINCIPAL_CACHE_TTL_SECONDS after the user is deactivated.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[schemas.Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, principal = entry
+            if expires_at <= now:
+                del self._entries[token]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, principal: schemas.Principal, token_exp: float):
+        """Caches a principal until min(now + ttl, token_exp), token_exp being a UNIX timestamp."""
+        ttl = min(self.ttl_seconds, token_exp - time.time())
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drops every cached token of a user, e.g. after deactivation; the next request reads the user again."""
+        with self._lock:
+            stale = [token for token, (_, principal) in self._entries.items() if principal.id == user_id]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """
     Retrieves a user by email and verifies their password.
@@ -81,9 +214,32 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     if not user:
         return None
         
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not verified:
         return None
-        
+
+    if new_hash:
+        _upgrade_password_hash(db, user, new_hash)
+
+    return user
+
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[User]:
+    """
+    Async counterpart of authenticate_user: the user lookup runs in the threadpool and
+    the password check on the hashing pool, so neither blocks the event loop.
+    """
+    user = await run_in_threadpool(crud.get_user_by_email, db, email)
+
+    if not user:
+        return None
+
+    verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not verified:
+        return None
+
+    if new_hash:
+        await run_in_threadpool(_upgrade_password_hash, db, user, new_hash)
+
     return user
 
 # def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
@@ -1,10 +1,20 @@
 
 # from app.database import Base, engine
 # from app import models
+from alembic import command
+
 from app.database import engine
 from app.models import Base
+from app.schema_check import alembic_config
+
 def create_db_and_tables():
+    """Creates a fresh database straight from the models and marks it as fully migrated.
+
+    Only for new, empty databases (local runs, benchmarks); existing ones are upgraded
+    with 'alembic upgrade head'.
+    """
     Base.metadata.create_all(bind=engine)
+    command.stamp(alembic_config(), "head")
 
 if __name__ == "__main__":
     create_db_and_tables()
@@ -1,18 +1,22 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import insert, delete
-from . import models, schemas
-from passlib.context import CryptContext
-from .auth import get_password_hash
-from typing import Optional, List, Dict, Set, Any
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import insert, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from . import models, schemas, settlement, money, audit, recurrence
+from .auth import get_password_hash, principal_cache
+from .metrics import registry
+from typing import Optional, List, Dict, Set, Any, Tuple, NamedTuple, Sequence
 from collections import defaultdict
-from sqlalchemy import func
+from itertools import groupby
+from sqlalchemy import func, select, literal, tuple_, union_all, cast, and_, case
 from fastapi import HTTPException, status
 import logging
 import json # Used for serializing audit trail data
+import operator
+import re
+import time
+import datetime
 from datetime import date
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # ----------- User CRUD -----------
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
@@ -28,10 +32,79 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def deactivate_user(db: Session, user_id: int):
+    """Marks a user inactive and drops their cached principals."""
+    db_user = get_user_by_id(db, user_id)
+    if not db_user:
+        return None
+
+    db_user.is_active = False
+    db.commit()
+    principal_cache.invalidate_user(user_id)
+    db.refresh(db_user)
+    return db_user
+
 # ----------- Group CRUD -----------  
 def get_group_by_id(db: Session, group_id: int):
     return db.query(models.Group).filter(models.Group.id == group_id).first()
 
+def get_group_detail(db: Session, group_id: int) -> Optional[models.Group]:
+    """Loads a group with everything schemas.Group serializes, in a fixed number of queries.
+
+    One query for the group and one per collection, whatever the group's size, instead
+    of lazy loads firing during response serialization.
+    """
+    return (
+        db.query(models.Group)
+        .options(
+            selectinload(models.Group.group_memberships),
+            selectinload(models.Group.expenses),
+            selectinload(models.Group.recurring_expenses),
+        )
+        .filter(models.Group.id == group_id)
+        .first()
+    )
+
+def get_group_summary(db: Session, group_id: int) -> Optional[schemas.GroupSummary]:
+    """Group header plus member/expense counts and the expense total, in a single query."""
+    member_count = (
+        select(func.count()).select_from(models.GroupMember)
+        .where(models.GroupMember.group_id == models.Group.id)
+        .scalar_subquery()
+    )
+    expense_stats = (
+        select(
+            models.Expense.group_id,
+            func.count().label("expense_count"),
+            func.coalesce(func.sum(models.Expense.amount_cents), 0).label("expense_total_cents"),
+        )
+        .group_by(models.Expense.group_id)
+        .subquery()
+    )
+    recurring_count = (
+        select(func.count()).select_from(models.RecurringExpense)
+        .where(models.RecurringExpense.group_id == models.Group.id)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(
+            models.Group.id,
+            models.Group.name,
+            models.Group.admin_id,
+            member_count.label("member_count"),
+            func.coalesce(expense_stats.c.expense_count, 0).label("expense_count"),
+            func.coalesce(expense_stats.c.expense_total_cents, 0).label("expense_total_cents"),
+            recurring_count.label("recurring_expense_count"),
+        )
+        .outerjoin(expense_stats, expense_stats.c.group_id == models.Group.id)
+        .where(models.Group.id == group_id)
+    ).first()
+    if row is None:
+        return None
+    summary = row._asdict()
+    summary["expense_total"] = money.from_cents(int(summary.pop("expense_total_cents")))
+    return schemas.GroupSummary(**summary)
+
 def get_user_groups(db: Session, user_id: int):
     # return db.query(models.Group).filter(models.Group.admin_id == user_id).all()
     return db.query(models.Group).join(models.GroupMember).filter(models.GroupMember.user_id == user_id).all()
@@ -138,6 +211,11 @@ def get_group_members(db: Session, group_id: int):
     """Get all group members for a specific group."""
     return db.query(models.GroupMember).filter(models.GroupMember.group_id == group_id).all()
 
+def get_group_member_ids(db: Session, group_id: int) -> List[int]:
+    """Get the user IDs of all members of a group without loading ORM objects."""
+    rows = db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == group_id).all()
+    return [row.user_id for row in rows]
+
 def get_group_member_record(db: Session, group_id: int, user_id: int):
     """Get a specific group member record."""
     return db.query(models.GroupMember).filter(
@@ -145,9 +223,18 @@ def get_group_member_record(db: Session, group_id: int, user_id: int):
         models.GroupMember.user_id == user_id
     ).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    """Get all users with pagination."""
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    """Get all users with pagination, ordered by id.
+
+    Pass the last id of the previous page as after_id (keyset) rather than skip (offset)
+    so deep pages stay as cheap as the first one.
+    """
+    query = db.query(models.User).order_by(models.User.id)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def get_group_member_by_ids(db: Session, group_id: int, user_id: int) -> Optional[models.GroupMember]:
     """Retrieves a specific group member relationship."""
@@ -244,13 +331,34 @@ def add_group_member(db: Session, group_id: int, user_id: int, inviter_id: int,
 #     db.execute(stmt)
 #     db.commit()
 def remove_group_member(db: Session, group_id: int, user_id: int):
-    """Removes a user from a group."""
+    """Removes a user from a group, and from the splits of the group's recurring expenses.
+
+    Recurring expenses the user pays for, or that are left with nobody to split with, stop:
+    their next_due_date is cleared, so nothing more is booked.
+    """
     db_member = get_group_member_by_ids(db, group_id, user_id)
-    if db_member:
-        db.delete(db_member)
-        db.commit()
-        return True
-    return False
+    if not db_member:
+        return False
+
+    schedule, member = models.RecurringExpense, models.RecurringExpenseMember
+    # Found through ix_recurring_expense_members_member, not by reading every schedule of the group
+    affected = db.execute(
+        select(member.recurring_expense_id)
+        .join(schedule, schedule.id == member.recurring_expense_id)
+        .where(member.member_id == user_id, schedule.group_id == group_id)
+    ).scalars().all()
+    if affected:
+        db.execute(delete(member.__table__).where(member.recurring_expense_id.in_(affected), member.member_id == user_id))
+        still_shared = select(member.recurring_expense_id).where(member.recurring_expense_id == schedule.id).exists()
+        db.execute(
+            update(schedule)
+            .where(schedule.id.in_(affected), (schedule.payer_id == user_id) | ~still_shared)
+            .values(next_due_date=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.delete(db_member)
+    db.commit()
+    return True
 
 # ----------- Expense CRUD -----------
 
@@ -275,28 +383,47 @@ def remove_group_member(db: Session, group_id: int, user_id: int):
 #     db.commit()
 
 #     return db_expense
-def create_expense(db: Session, expense: schemas.ExpenseCreate, payer_id: int):
-    """Creates a new expense in a group."""
+def create_expense(db: Session, expense: schemas.ExpenseCreate, current_user_id: int):
+    """
+    Creates a new expense in a group, stores its shares and books them into the balance ledger.
+    Without a shares breakdown the expense is split equally across the current members.
+    Raises ValueError for an invalid breakdown.
+    """
     db_expense = models.Expense(
-        payer_id=payer_id,
-        **expense.model_dump()
+        description=expense.description,
+        amount=expense.amount,
+        expense_date=expense.expense_date,
+        group_id=expense.group_id,
+        payer_id=expense.payer_id,
+        creator_id=current_user_id
+    )
+    share_amounts = _resolve_share_amounts(
+        db_expense.amount_cents, expense.shares, get_group_member_ids(db, expense.group_id)
     )
     db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
+    db.flush()
 
-    # Log the creation action
-    audit_entry = models.AuditTrail(
-        user_id=payer_id,
-        expense_id=db_expense.id,
-        action="created",
-        new_value=f"description: {db_expense.description}, amount: {db_expense.amount}"
+    # Shares, ledger update and audit entry share the expense's transaction: one commit
+    if share_amounts:
+        db.execute(_expense_shares_insert(db_expense.id, db_expense.group_id, share_amounts))
+    _apply_ledger_deltas(db, db_expense.group_id, _expense_ledger_deltas(
+        db_expense.amount_cents, db_expense.payer_id, share_amounts
+    ))
+    create_audit_log(
+        db, db_expense.group_id, current_user_id, "EXPENSE_CREATED",
+        expense_id=db_expense.id, new_value=_expense_audit_value(db_expense)
     )
-    db.add(audit_entry)
     db.commit()
-
+    db.refresh(db_expense)
     return db_expense
 
+def _expense_audit_value(db_expense: models.Expense) -> Dict[str, Any]:
+    return {
+        "description": db_expense.description,
+        "amount": float(db_expense.amount), # a JSON number, as in the API, so it can be range-filtered
+        "payer_id": db_expense.payer_id,
+    }
+
 def get_expense_by_id(db: Session, expense_id: int):
     """Retrieves a single expense by its ID."""
     return db.query(models.Expense).filter(models.Expense.id == expense_id).first()
@@ -330,17 +457,53 @@ def get_group_expenses(db: Session, group_id: int):
 #     db.commit()
     
 #     return db_expense
-def update_expense(db: Session, expense_id: int, expense_in: schemas.ExpenseUpdate):
-    """Updates the details of an existing expense."""
+def update_expense(db: Session, expense_id: int, expense_update: schemas.ExpenseUpdate, current_user_id: int):
+    """
+    Updates the details of an existing expense, re-books it in the balance ledger and
+    records the change in the audit trail as current_user_id.
+
+    A new shares breakdown replaces the stored one (an empty list splits equally across the
+    current members). If only the amount changes, it is re-split equally across the members
+    who already share the expense. Raises ValueError for an invalid breakdown.
+    """
     db_expense = get_expense_by_id(db, expense_id)
     if not db_expense:
         return None
 
-    # Update only fields that are provided
-    update_data = expense_in.model_dump(exclude_unset=True)
+    old_amount_cents, old_payer_id = db_expense.amount_cents, db_expense.payer_id
+    old_shares = {share.member_id: share.amount_cents for share in db_expense.shares}
+    old_value = _expense_audit_value(db_expense)
+
+    # Update only fields that are stored on the expense
+    update_data = expense_update.model_dump(exclude_unset=True, include={"description", "amount", "expense_date", "payer_id"})
     for key, value in update_data.items():
         setattr(db_expense, key, value)
 
+    new_shares = old_shares
+    if expense_update.shares is not None:
+        new_shares = _resolve_share_amounts(
+            db_expense.amount_cents, expense_update.shares, get_group_member_ids(db, db_expense.group_id)
+        )
+    elif db_expense.amount_cents != old_amount_cents:
+        participants = list(old_shares) or get_group_member_ids(db, db_expense.group_id)
+        new_shares = _resolve_share_amounts(db_expense.amount_cents, None, participants)
+
+    if new_shares != old_shares:
+        db.execute(delete(models.ExpenseShare).where(models.ExpenseShare.expense_id == expense_id))
+        if new_shares:
+            db.execute(_expense_shares_insert(expense_id, db_expense.group_id, new_shares))
+        db.expire(db_expense, ["shares"])
+
+    if (db_expense.amount_cents, db_expense.payer_id, new_shares) != (old_amount_cents, old_payer_id, old_shares):
+        deltas = _expense_ledger_deltas(db_expense.amount_cents, db_expense.payer_id, new_shares)
+        for user_id, delta in _expense_ledger_deltas(old_amount_cents, old_payer_id, old_shares).items():
+            deltas[user_id] = deltas.get(user_id, 0) - delta
+        _apply_ledger_deltas(db, db_expense.group_id, deltas)
+
+    create_audit_log(
+        db, db_expense.group_id, current_user_id, "EXPENSE_UPDATED",
+        expense_id=expense_id, old_value=old_value, new_value=_expense_audit_value(db_expense)
+    )
     db.add(db_expense)
     db.commit()
     db.refresh(db_expense)
@@ -365,27 +528,125 @@ def update_expense(db: Session, expense_id: int, expense_in: schemas.ExpenseUpda
 #         db.commit()
 #         return True
 #     return False
-def delete_expense(db: Session, expense_id: int):
-    """Deletes an expense."""
+def delete_expense(db: Session, expense_id: int, current_user_id: int):
+    """Deletes an expense, reverses its effect on the balance ledger and records the deletion as current_user_id."""
     db_expense = get_expense_by_id(db, expense_id)
     if not db_expense:
         return None
-    
+
+    deltas = _expense_ledger_deltas(
+        db_expense.amount_cents, db_expense.payer_id,
+        {share.member_id: share.amount_cents for share in db_expense.shares}
+    )
+    _apply_ledger_deltas(db, db_expense.group_id, {user_id: -delta for user_id, delta in deltas.items()})
+
+    # Not linked through expense_id: that foreign key cascades, and would delete the entry with the expense
+    create_audit_log(
+        db, db_expense.group_id, current_user_id, "EXPENSE_DELETED",
+        old_value={"expense_id": db_expense.id, **_expense_audit_value(db_expense)}
+    )
     db.delete(db_expense)
     db.commit()
     return db_expense
 
+def import_expense_batch(
+    db: Session,
+    group_id: int,
+    rows: List[Tuple[int, schemas.ExpenseCreate]],
+    member_ids: List[int],
+    current_user_id: int
+) -> List[Tuple[int, str]]:
+    """
+    Writes one batch of imported (line number, expense) rows in a single transaction: one
+    multi-row INSERT for the expenses, one for their shares, one ledger upsert and one
+    summarizing audit entry. Rows whose payer or shares are invalid are skipped and
+    returned as (line number, error).
+    """
+    rejected: List[Tuple[int, str]] = []
+    expense_rows, share_amounts_per_row = [], []
+    for line_no, expense in rows:
+        amount_cents = money.to_cents(expense.amount)
+        try:
+            if expense.payer_id not in member_ids:
+                raise ValueError(f"Payer {expense.payer_id} is not a group member")
+            share_amounts = _resolve_share_amounts(amount_cents, expense.shares, member_ids)
+        except ValueError as exc:
+            rejected.append((line_no, str(exc)))
+            continue
+        expense_rows.append({
+            "description": expense.description,
+            "amount_cents": amount_cents,
+            "expense_date": expense.expense_date,
+            "group_id": group_id,
+            "payer_id": expense.payer_id,
+            "creator_id": current_user_id,
+        })
+        share_amounts_per_row.append(share_amounts)
+
+    if not expense_rows:
+        return rejected
+
+    expense_ids = db.execute(
+        insert(models.Expense.__table__).returning(models.Expense.id, sort_by_parameter_order=True), expense_rows
+    ).scalars().all()
+
+    share_rows = [
+        {"expense_id": expense_id, "group_id": group_id, "member_id": member_id, "amount_cents": cents}
+        for expense_id, share_amounts in zip(expense_ids, share_amounts_per_row)
+        for member_id, cents in share_amounts.items()
+    ]
+    if share_rows:
+        db.execute(insert(models.ExpenseShare.__table__), share_rows)
+
+    deltas: Dict[int, int] = defaultdict(int)
+    for row, share_amounts in zip(expense_rows, share_amounts_per_row):
+        for user_id, delta in _expense_ledger_deltas(row["amount_cents"], row["payer_id"], share_amounts).items():
+            deltas[user_id] += delta
+    _apply_ledger_deltas(db, group_id, deltas)
+
+    create_audit_log(db, group_id, current_user_id, "EXPENSES_IMPORTED", new_value={
+        "count": len(expense_ids),
+        "first_expense_id": expense_ids[0],
+        "last_expense_id": expense_ids[-1],
+        "total": float(money.from_cents(sum(row["amount_cents"] for row in expense_rows))),
+    })
+    db.commit()
+    return rejected
+
 def get_group_expenses(db: Session, group_id: int):
     return db.query(models.Expense).filter(models.Expense.group_id == group_id).all()
 
+def iter_group_expenses(db: Session, group_id: int, batch_size: int = 1000):
+    """
+    Streams a group's expenses in id order as (expense row, [(member_id, amount_cents), ...])
+    without building ORM objects. Rows come off a server-side cursor batch_size at a time,
+    so memory does not grow with the group.
+    """
+    expense, share = models.Expense, models.ExpenseShare
+    stmt = (
+        select(
+            expense.id, expense.description, expense.amount_cents, expense.expense_date,
+            expense.payer_id, expense.creator_id, expense.timestamp,
+            share.member_id, share.amount_cents.label("share_cents"),
+        )
+        .outerjoin(share, share.expense_id == expense.id)
+        .where(expense.group_id == group_id)
+        .order_by(expense.id, share.member_id)
+        .execution_options(yield_per=batch_size)
+    )
+    # One row per share; consecutive rows of the same expense are folded back together
+    for _, rows in groupby(db.execute(stmt), key=lambda row: row.id):
+        rows = list(rows)
+        yield rows[0], [(row.member_id, row.share_cents) for row in rows if row.member_id is not None]
+
 # ----------- Audit Trail CRUD -----------
 def create_audit_trail_entry(
     db: Session, 
     user_id: int, 
     expense_id: int, 
     action: str, 
-    old_value: Optional[str], 
-    new_value: Optional[str]
+    old_value: Optional[Any], 
+    new_value: Optional[Any]
 ):
     """Creates an audit trail entry for an expense action."""
     db_audit = models.AuditTrail(
@@ -404,6 +665,20 @@ def get_group_audit_trail(db: Session, group_id: int):
         models.Expense.group_id == group_id
     ).order_by(models.AuditTrail.timestamp.desc()).all()
 
+def iter_group_audit_trail(db: Session, group_id: int, batch_size: int = 1000):
+    """Streams a group's audit entries oldest first as plain rows off a server-side cursor."""
+    audit = models.AuditTrail
+    stmt = (
+        select(
+            audit.id, audit.timestamp, audit.user_id, audit.action,
+            audit.expense_id, audit.recurring_expense_id, audit.old_value, audit.new_value,
+        )
+        .where(audit.group_id == group_id)
+        .order_by(audit.timestamp, audit.id)
+        .execution_options(yield_per=batch_size)
+    )
+    return iter(db.execute(stmt))
+
 # ----------- Recurring Expense CRUD -----------
 # def create_recurring_expense(db: Session, recurring_expense: schemas.RecurringExpenseCreate, payer_id: int):
    
@@ -427,12 +702,6 @@ def create_recurring_expense(
 ):
     """Creates a new recurring expense entry and logs the action."""
     
-    # Prepare split details JSON (simple format for this iteration)
-    split_details = {
-        "split_type": recurring_expense.split_type,
-        "member_ids": recurring_expense.member_ids
-    }
-
     db_recurring = models.RecurringExpense(
         description=recurring_expense.description,
         amount=recurring_expense.amount,
@@ -442,11 +711,15 @@ def create_recurring_expense(
         frequency=recurring_expense.frequency,
         start_date=recurring_expense.start_date,
         end_date=recurring_expense.end_date,
-        split_details_json=json.dumps(split_details)
+        split_type=recurring_expense.split_type,
+        next_due_date=recurrence.first_due(recurring_expense.start_date, recurring_expense.end_date)
     )
     
     db.add(db_recurring)
     db.flush()
+    db.execute(insert(models.RecurringExpenseMember.__table__), [
+        {"recurring_expense_id": db_recurring.id, "member_id": member_id} for member_id in recurring_expense.member_ids
+    ])
     
     # Log the creation of the recurring expense
     create_audit_log(
@@ -461,87 +734,314 @@ def create_recurring_expense(
 
     return db_recurring
 
-# def get_recurring_expenses_for_group(db: Session, group_id: int):
-#     """Retrieves all recurring expenses for a group."""
-#     return db.query(models.RecurringExpense)\
-#              .filter(models.RecurringExpense.group_id == group_id)\
-#              .all()
+def get_recurring_expenses_for_group(db: Session, group_id: int, member_id: Optional[int] = None):
+    """Retrieves all recurring expenses for a group, or only those whose split includes member_id."""
+    query = db.query(models.RecurringExpense)\
+              .filter(models.RecurringExpense.group_id == group_id)
+    if member_id is not None:
+        query = query.join(models.RecurringExpenseMember)\
+                     .filter(models.RecurringExpenseMember.member_id == member_id)
+    return query.all()
+
 def get_recurring_expense_by_id(db: Session, recurring_expense_id: int):
     """Retrieves a single recurring expense by its ID."""
     return db.query(models.RecurringExpense).filter(models.RecurringExpense.id == recurring_expense_id).first()
 
-# --- Balance Simplification ---
+def materialize_due_recurring_expenses(
+    db: Session,
+    today: date,
+    batch_size: int = 100,
+    max_occurrences: int = 100
+) -> Tuple[int, int]:
+    """
+    Turns the due occurrences of up to batch_size recurring expenses into expenses, in one
+    transaction: one multi-row INSERT for the expenses, one for their shares, one ledger
+    upsert per group and one audit entry per schedule. Returns (schedules, expenses created);
+    0 schedules means nothing is due, or another worker is already booking it.
+
+    The due queue is the partial index over next_due_date, which is NULL once a schedule is
+    exhausted, so finding work is a range scan over due rows only. Schedules are leased with
+    FOR UPDATE SKIP LOCKED on PostgreSQL, so several workers split the queue instead of
+    waiting on each other. Each gets at most max_occurrences per call; a long catch-up
+    continues in the next batch.
+
+    next_due_date is advanced by compare-and-set (it must still hold the value read) before
+    anything is booked, and only the schedules whose advance succeeded are booked; a
+    concurrent worker that got there first wins, even without row locks (SQLite). An
+    occurrence that already has its expense is skipped as well (uq_expenses_recurring_occurrence).
+    """
+    schedule = models.RecurringExpense
+    leased = db.execute(
+        select(
+            schedule.id, schedule.description, schedule.amount_cents, schedule.frequency,
+            schedule.start_date, schedule.end_date, schedule.next_due_date,
+            schedule.payer_id, schedule.group_id, schedule.creator_id,
+        )
+        .where(schedule.next_due_date <= today)
+        .order_by(schedule.next_due_date, schedule.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not leased:
+        db.rollback()
+        return 0, 0
+
+    occurrences_by_schedule, advances = {}, {}
+    for row in leased:
+        occurrences = recurrence.due_occurrences(
+            row.start_date, row.end_date, row.frequency, row.next_due_date, today, max_occurrences
+        )
+        occurrences_by_schedule[row.id] = occurrences
+        advances[row.id] = recurrence.next_due(row.start_date, row.end_date, row.frequency, occurrences[-1])
+
+    # One compare-and-set for the whole batch; RETURNING names the schedules it advanced
+    claimed = set(db.execute(
+        update(schedule)
+        .where(
+            schedule.id.in_(advances), # what the primary key lookup uses; the pairs below are the compare
+            tuple_(schedule.id, schedule.next_due_date).in_([(row.id, row.next_due_date) for row in leased]),
+        )
+        .values(next_due_date=case(advances, value=schedule.id))
+        .returning(schedule.id)
+    ).scalars())
+    leased = [row for row in leased if row.id in claimed]
+    if not leased:
+        db.rollback()
+        return 0, 0 # another worker advanced them all first and is draining the queue
+
+    member_ids_by_schedule: Dict[int, List[int]] = defaultdict(list)
+    for schedule_id, member_id in db.execute(
+        select(models.RecurringExpenseMember.recurring_expense_id, models.RecurringExpenseMember.member_id)
+        .where(models.RecurringExpenseMember.recurring_expense_id.in_(claimed))
+    ):
+        member_ids_by_schedule[schedule_id].append(member_id)
+
+    expense_rows, share_amounts_by_schedule = [], {}
+    for row in leased:
+        member_ids = member_ids_by_schedule.get(row.id) or [row.payer_id]
+        share_amounts_by_schedule[row.id] = money.split_evenly(row.amount_cents, member_ids)
+        expense_rows.extend({
+            "description": row.description,
+            "amount_cents": row.amount_cents,
+            "expense_date": occurrence_date,
+            "group_id": row.group_id,
+            "payer_id": row.payer_id,
+            "creator_id": row.creator_id,
+            "recurring_expense_id": row.id,
+            "occurrence_date": occurrence_date,
+        } for occurrence_date in occurrences_by_schedule[row.id])
+
+    # Occurrences a concurrent or earlier run already booked come back without a row
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    created = db.execute(
+        dialect_insert(models.Expense.__table__)
+        .on_conflict_do_nothing(index_elements=["recurring_expense_id", "occurrence_date"])
+        .returning(models.Expense.id, models.Expense.recurring_expense_id, models.Expense.occurrence_date),
+        expense_rows
+    ).all()
+
+    leased_by_id = {row.id: row for row in leased}
+    share_rows = []
+    deltas: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    for expense_id, schedule_id, _ in created:
+        row = leased_by_id[schedule_id]
+        share_amounts = share_amounts_by_schedule[schedule_id]
+        share_rows.extend(
+            {"expense_id": expense_id, "group_id": row.group_id, "member_id": member_id, "amount_cents": cents}
+            for member_id, cents in share_amounts.items()
+        )
+        for user_id, delta in _expense_ledger_deltas(row.amount_cents, row.payer_id, share_amounts).items():
+            deltas[row.group_id][user_id] += delta
+    if share_rows:
+        db.execute(insert(models.ExpenseShare.__table__), share_rows)
+    for group_id, group_deltas in deltas.items():
+        _apply_ledger_deltas(db, group_id, group_deltas)
+
+    created = sorted(created, key=lambda c: (c.recurring_expense_id, c.occurrence_date))
+    for schedule_id, booked in groupby(created, key=lambda c: c.recurring_expense_id):
+        booked = list(booked)
+        row = leased_by_id[schedule_id]
+        create_audit_log(db, row.group_id, row.creator_id, "RECURRING_EXPENSE_MATERIALIZED", recurring_expense_id=schedule_id, new_value={
+            "count": len(booked),
+            "first_occurrence": booked[0].occurrence_date.isoformat(),
+            "last_occurrence": booked[-1].occurrence_date.isoformat(),
+            "expense_ids": [c.id for c in booked],
+        })
+    db.commit()
+    return len(leased), len(created)
 
-def simplify_balances(db: Session, group_id: int) -> List[schemas.BalanceDetail]:
+# ----------- Balance Ledger -----------
+# member_balances holds every member's net position so that reading balances costs
+# O(members). Invariant: each user's ledger row equals what they paid minus the sum of
+# their expense_shares in the group. Shares are fixed when an expense is written, so
+# expense writes apply deltas and membership changes leave balances untouched.
+
+def _resolve_share_amounts(amount_cents: int, shares: Optional[List[schemas.ShareBase]], member_ids: List[int]) -> Dict[int, int]:
     """
-    Calculates and simplifies balances for a group using the Greedy algorithm.
+    Turns a requested shares breakdown into {member_id: cents}. An empty or missing
+    breakdown splits the amount equally across member_ids. Raises ValueError if the
+    breakdown names a non-member, repeats a member or does not add up to the amount.
     """
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
-    if not group:
-        return []
+    if not shares:
+        return money.split_evenly(amount_cents, member_ids)
+
+    share_amounts: Dict[int, int] = {}
+    for share in shares:
+        if share.member_id in share_amounts:
+            raise ValueError(f"Member {share.member_id} appears more than once in shares")
+        share_amounts[share.member_id] = money.to_cents(share.amount)
+
+    outsiders = share_amounts.keys() - set(member_ids)
+    if outsiders:
+        raise ValueError(f"Shares name users who are not group members: {sorted(outsiders)}")
+    if sum(share_amounts.values()) != amount_cents:
+        raise ValueError(
+            f"Shares add up to {money.from_cents(sum(share_amounts.values()))}, "
+            f"expected {money.from_cents(amount_cents)}"
+        )
+    return share_amounts
+
+def _expense_shares_insert(expense_id: int, group_id: int, share_amounts: Dict[int, int]):
+    """Builds the single multi-row INSERT that stores an expense's shares."""
+    return insert(models.ExpenseShare).values([
+        {"expense_id": expense_id, "group_id": group_id, "member_id": member_id, "amount_cents": amount_cents}
+        for member_id, amount_cents in share_amounts.items()
+    ])
+
+def _expense_ledger_deltas(amount_cents: int, payer_id: int, share_amounts: Dict[int, int]) -> Dict[int, int]:
+    """Returns the per-user net balance change, in cents, caused by one expense and its shares."""
+    if not share_amounts:
+        return {} # Nobody to split with; the expense is not booked
+
+    deltas: Dict[int, int] = defaultdict(int)
+    deltas[payer_id] += amount_cents
+    for member_id, share in share_amounts.items():
+        deltas[member_id] -= share
+    return deltas
+
+def _ledger_upsert(dialect_name: str, group_id: int, deltas: Dict[int, int]):
+    """Builds the single atomic upsert that adds deltas to the group's ledger rows."""
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(models.MemberBalance).values([
+        {"group_id": group_id, "user_id": user_id, "net_balance_cents": delta}
+        for user_id, delta in deltas.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[models.MemberBalance.group_id, models.MemberBalance.user_id],
+        set_={"net_balance_cents": models.MemberBalance.net_balance_cents + stmt.excluded.net_balance_cents}
+    )
 
-    # 1. Calculate net balance for each member
-    net_balances: Dict[int, float] = defaultdict(float)
-    member_ids = {m.id for m in group.members}
+def _apply_ledger_deltas(db: Session, group_id: int, deltas: Dict[int, int]):
+    """Adds deltas to the group's ledger rows."""
+    if deltas:
+        db.execute(_ledger_upsert(db.get_bind().dialect.name, group_id, deltas))
 
-    for expense in group.expenses:
-        if not member_ids: continue 
+def get_group_member_totals(db: Session, group_id: int):
+    """
+    Returns one row per user with (user_id, total_paid_cents, total_owed_cents, is_member)
+    for a group, computed by a single aggregate over expenses and expense_shares.
 
-        # Simple equal split logic:
-        share_per_member = round(expense.amount / len(member_ids), 2)
-        
-        net_balances[expense.payer_id] += expense.amount
-   
-        for member_id in member_ids:
-            net_balances[member_id] -= share_per_member
+    Users who have left the group still appear with whatever they paid or owe.
+    """
+    has_shares = select(models.ExpenseShare.id)\
+        .where(models.ExpenseShare.expense_id == models.Expense.id).exists()
+
+    # One movement per payment and per share, summed per user in a single pass
+    movements = union_all(
+        select(
+            models.Expense.payer_id.label("user_id"),
+            models.Expense.amount_cents.label("paid_cents"),
+            literal(0).label("owed_cents")
+        ).where(models.Expense.group_id == group_id, has_shares),
+        select(
+            models.ExpenseShare.member_id.label("user_id"),
+            literal(0).label("paid_cents"),
+            models.ExpenseShare.amount_cents.label("owed_cents")
+        ).where(models.ExpenseShare.group_id == group_id)
+    ).subquery()
+
+    is_member = select(models.GroupMember.user_id).where(
+        models.GroupMember.group_id == group_id,
+        models.GroupMember.user_id == movements.c.user_id
+    ).exists()
+
+    stmt = select(
+        movements.c.user_id,
+        func.sum(movements.c.paid_cents).label("total_paid_cents"),
+        func.sum(movements.c.owed_cents).label("total_owed_cents"),
+        is_member.label("is_member")
+    ).group_by(movements.c.user_id)
+
+    return db.execute(stmt).all()
+
+def compute_group_net_balances(db: Session, group_id: int) -> Dict[int, int]:
+    """Recomputes every user's net balance in cents from scratch out of expenses and their shares."""
+    return {
+        row.user_id: int(row.total_paid_cents) - int(row.total_owed_cents)
+        for row in get_group_member_totals(db, group_id)
+    }
 
-    filtered_balances = {user_id: balance for user_id, balance in net_balances.items() if abs(balance) > 0.01}
+def get_group_ledger(db: Session, group_id: int) -> Dict[int, int]:
+    """Reads the materialized net balances of a group, in cents."""
+    rows = db.query(models.MemberBalance.user_id, models.MemberBalance.net_balance_cents)\
+             .filter(models.MemberBalance.group_id == group_id).all()
+    return {row.user_id: row.net_balance_cents for row in rows}
+
+def rebuild_group_ledger(db: Session, group_id: int):
+    """Replaces the group's ledger rows with freshly computed balances. Does not commit."""
+    db.execute(delete(models.MemberBalance).where(models.MemberBalance.group_id == group_id))
+    net_balances = compute_group_net_balances(db, group_id)
+    if net_balances:
+        db.execute(insert(models.MemberBalance), [
+            {"group_id": group_id, "user_id": user_id, "net_balance_cents": balance}
+            for user_id, balance in net_balances.items()
+        ])
+
+def verify_group_ledger(db: Session, group_id: int) -> Dict[int, Dict[str, int]]:
+    """
+    Compares the ledger with a full recomputation.
+    Returns {user_id: {"ledger": cents, "expected": cents}} for every drifted member.
+    """
+    ledger = get_group_ledger(db, group_id)
+    expected = compute_group_net_balances(db, group_id)
 
-    # 2. Separate debtors and creditors
-    debtors = [] # [(debt_amount, user_id)] - stored as negative for sorting
-    creditors = [] # [(credit_amount, user_id)] - stored as negative for sorting
-    
-    for user_id, balance in filtered_balances.items():
-        if balance < 0:
-            debtors.append((balance, user_id))
-        elif balance > 0:
-            creditors.append((-balance, user_id)) 
+    drift = {}
+    for user_id in ledger.keys() | expected.keys():
+        ledger_balance = ledger.get(user_id, 0)
+        expected_balance = expected.get(user_id, 0)
+        if ledger_balance != expected_balance:
+            drift[user_id] = {"ledger": ledger_balance, "expected": expected_balance}
+    return drift
 
-    debtors.sort() 
-    creditors.sort() 
+# --- Balance Simplification ---
 
-    balances_to_settle: List[schemas.BalanceDetail] = []
-    
-    # 3. Simplify balances (Greedy algorithm)
-    while debtors and creditors:
-        debt_amount_neg, debtor_id = debtors.pop(0) 
-        credit_amount_neg, creditor_id = creditors.pop(0)
+SIMPLIFY_BALANCES_SECONDS = registry.histogram(
+    "simplify_balances_duration_seconds", "Time to read a group's ledger and settle it", labelnames=("minimize_transactions",)
+)
+SETTLEMENT_TRANSFERS = registry.counter("settlement_transfers_total", "Payments produced by the settlement engine")
 
-        debt_abs = abs(debt_amount_neg)
-        credit_abs = abs(credit_amount_neg)
-        
-        settlement_amount = round(min(debt_abs, credit_abs), 2)
-        
-        if settlement_amount > 0:
-            balances_to_settle.append(schemas.BalanceDetail(
-                payer_id=debtor_id, 
-                payee_id=creditor_id, 
-                amount=settlement_amount
-            ))
-
-        remaining_debt = round(debt_abs - settlement_amount, 2)
-        remaining_credit = round(credit_abs - settlement_amount, 2)
-        
-        if remaining_debt > 0.01:
-            debtors.append((-remaining_debt, debtor_id))
-        
-        if remaining_credit > 0.01:
-            creditors.append((-remaining_credit, creditor_id)) 
-            
-        debtors.sort()
-        creditors.sort()
-        
-    return balances_to_settle
+def simplify_balances(db: Session, group_id: int, minimize_transactions: bool = False) -> List[schemas.BalanceDetail]:
+    """
+    Simplifies the group's ledger balances into payments using the settlement engine.
+    """
+    start = time.perf_counter()
+    try:
+        # 1. Read the materialized net balance of each member
+        net_balances = get_group_ledger(db, group_id)
+
+        # 2. Settle; balances are exact cents, so no tolerance is needed
+        return _settle_net_balances(net_balances, minimize_transactions)
+    finally:
+        SIMPLIFY_BALANCES_SECONDS.labels(str(minimize_transactions).lower()).observe(time.perf_counter() - start)
+
+def _settle_net_balances(net_balances: Dict[int, int], minimize_transactions: bool = False) -> List[schemas.BalanceDetail]:
+    """Runs the settlement engine over net balances in cents and converts the transfers to schemas."""
+    transfers = settlement.settle(net_balances, minimize_transactions=minimize_transactions)
+    SETTLEMENT_TRANSFERS.inc(len(transfers))
+    return [
+        schemas.BalanceDetail(payer_id=payer_id, payee_id=payee_id, amount=money.from_cents(amount_cents))
+        for payer_id, payee_id, amount_cents in transfers
+    ]
 
 # Default calculate_group_balances function (US10)
 # def calculate_group_balances(db: Session, group_id: int) -> schemas.GroupBalance:
@@ -724,7 +1224,7 @@ def simplify_balances(db: Session, group_id: int) -> List[schemas.BalanceDetail]
 #     return balances_to_settle
 
 # --- Balance Calculation (Greedy Algorithm for Simplification) ---
-def get_group_balances(db: Session, group_id: int) -> List[schemas.BalanceDetail]:
+def get_group_balances(db: Session, group_id: int, minimize_transactions: bool = False) -> List[schemas.BalanceDetail]:
     """
     Calculates the simplified net balances for a specific group.
     
@@ -733,96 +1233,11 @@ def get_group_balances(db: Session, group_id: int) -> List[schemas.BalanceDetail
     set of direct payments.
     """
     
-    # 1. Aggregate total expenses paid by each user
-    expense_data = db.query(
-        models.Expense.payer_id,
-        func.sum(models.Expense.amount).label('total_paid')
-    ).filter(models.Expense.group_id == group_id).group_by(models.Expense.payer_id).all()
-
-    # 2. Get all members in the group
-    members = db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == group_id).all()
-    member_ids = {m.user_id for m in members}
-    num_members = len(member_ids)
-    
-    if num_members == 0:
-        return []
-
-    # 3. Calculate equal share and net balance for each member
-    total_group_expense = sum(d.total_paid for d in expense_data)
-    equal_share = round(total_group_expense / num_members, 2) if num_members > 0 else 0
+    # 1. Aggregate paid and owed totals per user in one query
+    member_balances = compute_group_net_balances(db, group_id)
 
-    net_balances: Dict[int, float] = defaultdict(lambda: -equal_share) # Everyone initially owes their share
-    
-    # Update balances with paid amounts
-    for payer_id, total_paid in expense_data:
-        # Net balance = Total Paid - Equal Share. 
-        # A positive balance means they are a creditor (are owed money).
-        # A negative balance means they are a debtor (owe money).
-        net_balances[payer_id] = round(total_paid - equal_share, 2)
-    
-    # Ensure all members (even those who paid nothing) are included
-    for user_id in member_ids:
-        if user_id not in net_balances:
-            net_balances[user_id] = round(-equal_share, 2)
-            
-    # 4. Separate debtors and creditors
-    debtors = [] # (debt_amount, user_id) where debt_amount is POSITIVE
-    creditors = [] # (credit_amount, user_id) where credit_amount is POSITIVE
-
-    for user_id, balance in net_balances.items():
-        # Only consider users who are part of the group
-        if user_id not in member_ids:
-            continue
-            
-        if balance < -0.01: # Owes money
-            debtors.append((-balance, user_id)) 
-        elif balance > 0.01: # Is owed money
-            creditors.append((balance, user_id))
-
-    # Sort: Greedy algorithm works best when pairing the largest debt with the largest credit
-    # Debtors: sort by debt amount descending
-    debtors.sort(key=lambda x: x[0], reverse=True) 
-    # Creditors: sort by credit amount descending
-    creditors.sort(key=lambda x: x[0], reverse=True) 
-
-    balances_to_settle: List[schemas.BalanceDetail] = []
-    
-    # 5. Simplify balances (Greedy approach)
-    while debtors and creditors:
-        # Get the largest debt and the largest credit
-        debt_amount, debtor_id = debtors.pop(0) 
-        credit_amount, creditor_id = creditors.pop(0)
-
-        # Transaction amount: the minimum of the two
-        settlement_amount = round(min(debt_amount, credit_amount), 2)
-        
-        if settlement_amount > 0.01:
-            # Record transaction: debtor_id pays settlement_amount to creditor_id
-            balances_to_settle.append(schemas.BalanceDetail(
-                payer_id=debtor_id, 
-                payee_id=creditor_id, 
-                amount=settlement_amount
-            ))
-
-        # Update remaining balances
-        remaining_debt = round(debt_amount - settlement_amount, 2)
-        remaining_credit = round(credit_amount - settlement_amount, 2)
-        
-        # Push back the remaining balance to the list
-        if remaining_debt > 0.01:
-            # The debtor still owes money
-            debtors.append((remaining_debt, debtor_id))
-        
-        if remaining_credit > 0.01:
-            # The creditor is still owed money
-            creditors.append((remaining_credit, creditor_id)) 
-            
-        # Re-sort to maintain the greedy principle
-        debtors.sort(key=lambda x: x[0], reverse=True)
-        creditors.sort(key=lambda x: x[0], reverse=True) 
-
-    return balances_to_settle
-    return schemas.GroupBalance(group_id=group_id, balances=balances_to_settle)
+    # 2. Simplify balances
+    return _settle_net_balances(member_balances, minimize_transactions)
 
 # --- Audit Trail Helpers ---
 
@@ -833,23 +1248,127 @@ def create_audit_log(
     action: str, 
     expense_id: Optional[int] = None, 
     old_value: Optional[Dict[str, Any]] = None, 
-    new_value: Optional[Dict[str, Any]] = None
+    new_value: Optional[Dict[str, Any]] = None,
+    recurring_expense_id: Optional[int] = None
 ):
-    """Logs an action to the audit trail. Uses json.dumps for old/new values."""
-    db_log = models.AuditTrail(
-        group_id=group_id,
-        user_id=user_id,
-        expense_id=expense_id,
-        action=action,
-        old_value=json.dumps(old_value) if old_value is not None else None,
-        new_value=json.dumps(new_value) if new_value is not None else None,
+    """Logs an action to the audit trail. old/new values are stored as JSON (JSONB on PostgreSQL).
+
+    The row is queued on the session and written when its transaction commits (app/audit.py).
+    """
+    audit.record(
+        db, group_id, user_id, action,
+        expense_id=expense_id, recurring_expense_id=recurring_expense_id, old_value=old_value, new_value=new_value
     )
-    db.add(db_log)
-    db.flush() # Use flush so the log ID is generated before commit
-
-def get_audit_trail_for_group(db: Session, group_id: int, skip: int = 0, limit: int = 50):
-    """Retrieves the audit trail for a specific group, ordered by timestamp descending."""
-    return db.query(models.AuditTrail)\
-             .filter(models.AuditTrail.group_id == group_id)\
-             .order_by(models.AuditTrail.timestamp.desc())\
-             .offset(skip).limit(limit).all()
+
+class AuditPredicate(NamedTuple):
+    """A condition on a key inside an audit entry's old_value or new_value."""
+    column: str # "old_value" or "new_value"
+    path: Tuple[str, ...]
+    op: str
+    value: Any
+
+_AUDIT_PREDICATE = re.compile(r"(old_value|new_value)((?:\.\w+)+)(!=|<=|>=|=|<|>)(.*)", re.DOTALL)
+_COMPARISONS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+def parse_audit_predicate(predicate: str) -> AuditPredicate:
+    """Parses "<old_value|new_value>.<key>[.<key>...]<op><value>", e.g. "new_value.amount>=100".
+
+    op is one of = != < <= > >=. The value is read as JSON if it parses (3, 1.5, true, null,
+    "3") and as a plain string otherwise. Raises ValueError for anything else.
+    """
+    match = _AUDIT_PREDICATE.fullmatch(predicate)
+    if not match:
+        raise ValueError(f"Invalid payload filter {predicate!r}; expected e.g. new_value.payer_id=3")
+    column, path, op, raw = match.groups()
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"Payload filter {predicate!r} must compare with a string, number, boolean or null")
+    if op not in ("=", "!=") and (value is None or isinstance(value, bool)):
+        raise ValueError(f"Payload filter {predicate!r} can only order numbers and strings")
+    return AuditPredicate(column, tuple(path[1:].split(".")), op, value)
+
+def _audit_predicate_clause(dialect_name: str, predicate: AuditPredicate):
+    column = getattr(models.AuditTrail, predicate.column)
+    path = "$" + "".join(f".{json.dumps(key)}" for key in predicate.path)
+
+    if dialect_name == "postgresql":
+        if predicate.op == "=":
+            # Containment is what the jsonb_path_ops GIN indexes answer
+            document = predicate.value
+            for key in reversed(predicate.path):
+                document = {key: document}
+            return column.op("@>")(cast(document, postgresql.JSONB))
+        # Comparing values of different JSON types is unknown, hence no match, as below
+        return column.op("@?")(cast(f"{path} ? (@ {predicate.op} {json.dumps(predicate.value)})", postgresql.JSONPATH))
+
+    # JSON1 functions (SQLite); the JSON type is checked so e.g. "10" never compares as 10
+    json_type = func.json_type(column, path)
+    value = predicate.value
+    if value is None:
+        return json_type == "null" if predicate.op == "=" else json_type != "null"
+    if isinstance(value, bool):
+        return _COMPARISONS[predicate.op](json_type, "true" if value else "false") & json_type.in_(("true", "false"))
+    types = ("integer", "real") if isinstance(value, (int, float)) else ("text",)
+    return and_(json_type.in_(types), _COMPARISONS[predicate.op](func.json_extract(column, path), value))
+
+def _audit_timestamp_bound(dialect_name: str, value: datetime.datetime):
+    """A datetime to compare audit_trail.timestamp against.
+
+    SQLite compares timestamps as text, and CURRENT_TIMESTAMP writes UTC without fractional
+    seconds; a bound datetime would render as "...:05.000000" and sort after "...:05".
+    """
+    if dialect_name != 'sqlite':
+        return value
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return literal(value.isoformat(sep=" "))
+
+def get_audit_trail_for_group(
+    db: Session,
+    group_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    before: Optional[Tuple[datetime.datetime, int]] = None,
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    expense_id: Optional[int] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    payload: Sequence[AuditPredicate] = ()
+):
+    """Retrieves the audit trail for a specific group, ordered by timestamp descending.
+
+    `before` is the (timestamp, id) of the last entry of the previous page; the id breaks
+    ties between entries written in the same instant. Without it, falls back to skip.
+    The other arguments narrow the entries down, all in SQL: since is inclusive, until
+    exclusive, and every payload predicate must hold.
+    """
+    query = db.query(models.AuditTrail)\
+              .filter(models.AuditTrail.group_id == group_id)\
+              .order_by(models.AuditTrail.timestamp.desc(), models.AuditTrail.id.desc())
+    if action is not None:
+        query = query.filter(models.AuditTrail.action == action)
+    if user_id is not None:
+        query = query.filter(models.AuditTrail.user_id == user_id)
+    if expense_id is not None:
+        query = query.filter(models.AuditTrail.expense_id == expense_id)
+    dialect_name = db.get_bind().dialect.name
+    if since is not None:
+        query = query.filter(models.AuditTrail.timestamp >= _audit_timestamp_bound(dialect_name, since))
+    if until is not None:
+        query = query.filter(models.AuditTrail.timestamp < _audit_timestamp_bound(dialect_name, until))
+    for predicate in payload:
+        query = query.filter(_audit_predicate_clause(dialect_name, predicate))
+    if before is not None:
+        before_timestamp = _audit_timestamp_bound(dialect_name, before[0])
+        query = query.filter(
+            # The plain bound lets PostgreSQL skip audit_trail partitions newer than the cursor
+            models.AuditTrail.timestamp <= before_timestamp,
+            tuple_(models.AuditTrail.timestamp, models.AuditTrail.id) < tuple_(before_timestamp, before[1]),
+        )
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
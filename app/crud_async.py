@@ -0,0 +1,82 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+import time
+from . import models, schemas, crud, audit
+
+# Async counterparts of the hot crud functions, used by async_routes when USE_ASYNC_DB is on.
+# Pure helpers (ledger deltas, settlement) are shared with crud so both stacks behave alike.
+
+# ----------- User CRUD -----------
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    return await db.get(models.User, user_id)
+
+# ----------- Group CRUD -----------
+async def get_group_by_id(db: AsyncSession, group_id: int) -> Optional[models.Group]:
+    return await db.get(models.Group, group_id)
+
+async def get_group_member_record(db: AsyncSession, group_id: int, user_id: int) -> Optional[models.GroupMember]:
+    return await db.get(models.GroupMember, (group_id, user_id))
+
+async def get_group_members(db: AsyncSession, group_id: int) -> List[models.GroupMember]:
+    result = await db.execute(select(models.GroupMember).where(models.GroupMember.group_id == group_id))
+    return list(result.scalars().all())
+
+async def get_group_member_ids(db: AsyncSession, group_id: int) -> List[int]:
+    result = await db.execute(select(models.GroupMember.user_id).where(models.GroupMember.group_id == group_id))
+    return list(result.scalars().all())
+
+# ----------- Expense CRUD -----------
+async def get_expense_by_id(db: AsyncSession, expense_id: int) -> Optional[models.Expense]:
+    return await db.get(models.Expense, expense_id)
+
+async def create_expense(db: AsyncSession, expense: schemas.ExpenseCreate, current_user_id: int) -> models.Expense:
+    """Creates a new expense in a group, stores its shares and books them into the balance ledger."""
+    db_expense = models.Expense(
+        description=expense.description,
+        amount=expense.amount,
+        expense_date=expense.expense_date,
+        group_id=expense.group_id,
+        payer_id=expense.payer_id,
+        creator_id=current_user_id
+    )
+    share_amounts = crud._resolve_share_amounts(
+        db_expense.amount_cents, expense.shares, await get_group_member_ids(db, expense.group_id)
+    )
+    db.add(db_expense)
+    await db.flush()
+
+    # Shares, ledger update and audit entry share the expense's transaction: one commit
+    if share_amounts:
+        await db.execute(crud._expense_shares_insert(db_expense.id, db_expense.group_id, share_amounts))
+    deltas = crud._expense_ledger_deltas(db_expense.amount_cents, db_expense.payer_id, share_amounts)
+    if deltas:
+        await db.execute(crud._ledger_upsert(db.get_bind().dialect.name, db_expense.group_id, deltas))
+    audit.record(
+        db, db_expense.group_id, current_user_id, "EXPENSE_CREATED",
+        expense_id=db_expense.id, new_value=crud._expense_audit_value(db_expense)
+    )
+    await db.commit()
+    await db.refresh(db_expense) # also loads the selectin shares relationship
+    return db_expense
+
+# --- Balance Simplification ---
+async def get_group_ledger(db: AsyncSession, group_id: int) -> Dict[int, int]:
+    """Reads the materialized net balances of a group, in cents."""
+    result = await db.execute(
+        select(models.MemberBalance.user_id, models.MemberBalance.net_balance_cents)
+        .where(models.MemberBalance.group_id == group_id)
+    )
+    return {row.user_id: row.net_balance_cents for row in result}
+
+async def simplify_balances(db: AsyncSession, group_id: int, minimize_transactions: bool = False) -> List[schemas.BalanceDetail]:
+    """Simplifies the group's ledger balances into payments using the settlement engine."""
+    start = time.perf_counter()
+    try:
+        return crud._settle_net_balances(await get_group_ledger(db, group_id), minimize_transactions)
+    finally:
+        crud.SIMPLIFY_BALANCES_SECONDS.labels(str(minimize_transactions).lower()).observe(time.perf_counter() - start)
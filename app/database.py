@@ -19,9 +19,14 @@
 #         db.close()
 
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from .metrics import CallbackGauge, Family, registry
+from . import query_stats
 
 # -------------------------------------------------------------
 # CRITICAL FIX: Load DATABASE_URL from environment
@@ -35,12 +40,167 @@ SQLALCHEMY_DATABASE_URL = os.environ.get(
     "postgresql://user:password@db:5432/db_name"
 )
 
+# Connection pool sizing; size it against (uvicorn workers x threadpool size)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "-1")) # seconds, -1 disables
+# Pre-ping policy: "always" pings on every checkout, "idle" only after the connection sat
+# unused for DB_POOL_PRE_PING_IDLE_SECONDS, "never" skips the round-trip entirely
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "always").lower()
+DB_POOL_PRE_PING = {"true": "always", "false": "never"}.get(DB_POOL_PRE_PING, DB_POOL_PRE_PING)
+DB_POOL_PRE_PING_IDLE_SECONDS = float(os.environ.get("DB_POOL_PRE_PING_IDLE_SECONDS", "30"))
+
+# Pool series, labelled engine="sync" (engine) or engine="async" (async_engine, with USE_ASYNC_DB)
+POOL_LABELS = ("engine",)
+_POOL_CHECKOUTS = registry.counter("db_pool_checkouts_total", "Connections checked out of the pool", POOL_LABELS)
+_POOL_CHECKINS = registry.counter("db_pool_checkins_total", "Connections returned to the pool", POOL_LABELS)
+_POOL_CONNECTS = registry.counter("db_pool_connects_total", "New database connections opened", POOL_LABELS)
+_POOL_INVALIDATIONS = registry.counter("db_pool_invalidations_total", "Pooled connections invalidated", POOL_LABELS)
+_POOL_CHECKOUT_WAIT = registry.histogram("db_pool_checkout_wait_seconds", "Time spent obtaining a connection", POOL_LABELS)
+_POOL_CHECKOUT_LATENCY = registry.histogram("db_pool_checkout_latency_seconds", "Full checkout time, including any pre-ping", POOL_LABELS)
+_POOL_GAUGES = {
+    # QueuePool method -> (metric name, help)
+    "size": ("db_pool_size", "Configured pool size"),
+    "checkedout": ("db_pool_checked_out", "Connections currently checked out"),
+    "checkedin": ("db_pool_checked_in", "Idle connections in the pool"),
+    "overflow": ("db_pool_overflow", "Connections open beyond the pool size"),
+}
+_POOL_GAUGE_FAMILIES = {
+    method: registry.register(name, documentation, Family(POOL_LABELS, kind="gauge"))
+    for method, (name, documentation) in _POOL_GAUGES.items()
+}
+
+class PoolMetrics:
+    """Connection pool counters and checkout timings of one engine, fed by pool events."""
+
+    def __init__(self, label: str):
+        self.checkouts = _POOL_CHECKOUTS.labels(label)
+        self.checkins = _POOL_CHECKINS.labels(label)
+        self.connects = _POOL_CONNECTS.labels(label)
+        self.invalidations = _POOL_INVALIDATIONS.labels(label)
+        self.checkout_wait = _POOL_CHECKOUT_WAIT.labels(label) # time spent obtaining a connection (waiting + connecting)
+        self.checkout_latency = _POOL_CHECKOUT_LATENCY.labels(label) # full checkout, including any pre-ping
+
+pool_metrics = PoolMetrics("sync")
+
+class _CheckoutTimingMixin:
+    """Times checkouts into pool_metrics; pool events have no hook before a checkout starts."""
+
+    pool_metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.pool_metrics.checkout_wait.observe(time.perf_counter() - start)
+
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        self.pool_metrics.checkout_latency.observe(time.perf_counter() - start)
+        return connection
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pool_metrics = pool_metrics
+
+def _instrument_pool(engine, metrics: PoolMetrics, label: str):
+    """Counts pool events into metrics, applies the idle pre-ping policy and exposes the pool gauges."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects.inc()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts.inc()
+
+        if DB_POOL_PRE_PING != "idle":
+            return
+        idle_since = connection_record.info.get("checked_in_at")
+        if idle_since is None or time.monotonic() - idle_since < DB_POOL_PRE_PING_IDLE_SECONDS:
+            return
+
+        # Raising DisconnectionError makes the pool discard this connection and retry with a fresh one
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.checkins.inc()
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations.inc()
+
+    if isinstance(engine.pool, QueuePool):
+        # engine.pool is looked up on every read: dispose() replaces the pool object
+        for method, family in _POOL_GAUGE_FAMILIES.items():
+            family.add(CallbackGauge(lambda method=method: getattr(engine.pool, method)()), label)
+
 # Setup the database engine and session
-# The 'pool_pre_ping=True' setting helps manage connection health in a pool
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True
+_pool_options = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING == "always",
 )
+if ":memory:" in SQLALCHEMY_DATABASE_URL:
+    # In-memory SQLite lives in a single connection; keep SQLAlchemy's default pool for it
+    _pool_options = {}
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+else:
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        **_pool_options
+    )
+
+query_stats.instrument(engine)
+_instrument_pool(engine, pool_metrics, "sync")
+
+def _pool_stats(engine, metrics: PoolMetrics) -> dict:
+    pool = engine.pool
+    stats = {}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            pool_size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    stats.update({
+        "checkouts_total": metrics.checkouts.value,
+        "checkins_total": metrics.checkins.value,
+        "connects_total": metrics.connects.value,
+        "invalidations_total": metrics.invalidations.value,
+        "checkout_wait_seconds": metrics.checkout_wait.snapshot(),
+        "checkout_latency_seconds": metrics.checkout_latency.snapshot(),
+    })
+    return stats
+
+def pool_stats() -> dict:
+    """
+    Point-in-time view of the sync engine's pool plus the accumulated metrics; with
+    USE_ASYNC_DB, the async engine's pool (which serves the async routes) under "async".
+    """
+    stats = _pool_stats(engine, pool_metrics)
+    if async_engine is not None:
+        stats["async"] = _pool_stats(async_engine.sync_engine, async_pool_metrics)
+    return stats
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -52,3 +212,43 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# -------------------------------------------------------------
+# Optional async stack, switched on with USE_ASYNC_DB=true.
+# Needs asyncpg for PostgreSQL (or aiosqlite for a local SQLite database).
+# -------------------------------------------------------------
+def _to_async_url(url: str) -> str:
+    """Maps a sync database URL onto its async driver."""
+    if url.startswith(("postgresql://", "postgresql+psycopg2://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+USE_ASYNC_DB = os.environ.get("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", _to_async_url(SQLALCHEMY_DATABASE_URL))
+
+async_engine = None
+async_pool_metrics = None
+AsyncSessionLocal = None
+if USE_ASYNC_DB:
+    async_pool_metrics = PoolMetrics("async")
+
+    class InstrumentedAsyncAdaptedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+        pool_metrics = async_pool_metrics
+
+    # Named explicitly: some async dialects (aiosqlite) default to NullPool, which rejects sizing options;
+    # the subclass times checkouts like the sync engine's pool
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **({"poolclass": InstrumentedAsyncAdaptedQueuePool, **_pool_options} if _pool_options else {})
+    )
+    query_stats.instrument(async_engine.sync_engine)
+    _instrument_pool(async_engine.sync_engine, async_pool_metrics, "async")
+    # expire_on_commit=False: attributes stay loaded after commit, since lazy loads cannot run implicitly
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
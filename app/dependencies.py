@@ -119,43 +119,108 @@
 from fastapi import Depends, HTTPException, status, Path
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from . import crud, auth, database, schemas
+from . import crud, crud_async, auth, database, schemas
 from .models import User, GroupMember
-from typing import Annotated
+from typing import Annotated, Optional
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)) -> User:
+def get_current_user(db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)) -> schemas.Principal:
     """
-    Authenticates the user via the provided JWT token and returns the corresponding User model object.
+    Authenticates the user via the provided JWT token and returns a lightweight Principal.
+    Tokens seen recently are served from auth.principal_cache without touching the database.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    try:
-        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])    
-        user_email: str = payload.get("sub")
-        
-        if user_email is None:
+
+    principal = auth.principal_cache.get(token)
+    if principal is None:
+        try:
+            payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            user_email: str = payload.get("sub")
+            user_id: Optional[int] = payload.get("uid")
+
+            if user_email is None:
+                raise credentials_exception
+
+        except JWTError:
             raise credentials_exception
-            
-    except JWTError:   
-        raise credentials_exception
-        
-    user = crud.get_user_by_email(db, email=user_email)
-    
-    if user is None:
-        raise credentials_exception
 
-    return user
+        # Tokens issued before the uid claim existed only carry the email
+        if user_id is not None:
+            user = crud.get_user_by_id(db, user_id=user_id)
+        else:
+            user = crud.get_user_by_email(db, email=user_email)
+
+        if user is None:
+            raise credentials_exception
+
+        principal = schemas.Principal.model_validate(user)
+        auth.principal_cache.put(token, principal, payload["exp"])
+
+    if not principal.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    return principal
+
+def get_current_user_id(db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)) -> int:
+    """
+    Returns the authenticated user's ID, for routes that need nothing but the ID. It goes
+    through get_current_user: a cached principal answers without the database, otherwise the
+    user is read by the token's uid (primary key) and is_active checked. A deactivation made
+    in another worker therefore applies here within PRINCIPAL_CACHE_TTL_SECONDS, not at token expiry.
+    """
+    return get_current_user(db=db, token=token).id
+
+async def get_current_user_async(db: AsyncSession = Depends(database.get_async_db), token: str = Depends(oauth2_scheme)) -> schemas.Principal:
+    """Async variant of get_current_user for routes running on the async database stack."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    principal = auth.principal_cache.get(token)
+    if principal is None:
+        try:
+            payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            user_email: str = payload.get("sub")
+            user_id: Optional[int] = payload.get("uid")
+
+            if user_email is None:
+                raise credentials_exception
+
+        except JWTError:
+            raise credentials_exception
+
+        if user_id is not None:
+            user = await crud_async.get_user_by_id(db, user_id=user_id)
+        else:
+            user = await crud_async.get_user_by_email(db, email=user_email)
+
+        if user is None:
+            raise credentials_exception
+
+        principal = schemas.Principal.model_validate(user)
+        auth.principal_cache.put(token, principal, payload["exp"])
+
+    if not principal.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    return principal
+
+async def get_current_user_id_async(db: AsyncSession = Depends(database.get_async_db), token: str = Depends(oauth2_scheme)) -> int:
+    """Async variant of get_current_user_id."""
+    return (await get_current_user_async(db=db, token=token)).id
 
 def get_group_with_access_check(
     group_id: int = Path(..., description="The ID of the group."),
-    current_user: User = Depends(get_current_user),
+    current_user: schemas.Principal = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
     """Gets a group and verifies the current user has access to it."""
@@ -175,7 +240,7 @@ def get_group_with_access_check(
 
 def get_current_group_member(
     group_id: int = Path(..., description="The ID of the group."),
-    current_user: User = Depends(get_current_user),
+    current_user: schemas.Principal = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ) -> GroupMember:
     """Checks if the current user is a member of the specified group and returns the membership record."""
@@ -201,7 +266,7 @@ def verify_group_admin(
 
 def verify_group_owner(
     group_id: int = Path(..., description="The ID of the group."),
-    current_user: User = Depends(get_current_user),
+    current_user: schemas.Principal = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
     """Verifies that the current user is the owner/admin of the specified group."""
@@ -0,0 +1,176 @@
+"""
+Streaming bulk import of expenses into one group. The request body is consumed chunk by
+chunk and written in batches, so memory stays flat however many rows are uploaded.
+
+Two formats:
+  - CSV (text/csv): a header row naming description, amount, expense_date and payer_id,
+    plus an optional shares column written as "member_id:amount;member_id:amount". Quoted
+    fields may contain line breaks.
+  - NDJSON (application/x-ndjson): one ExpenseCreate object per line; group_id may be
+    omitted and shares defaults to an equal split.
+"""
+import csv
+import json
+import os
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from . import crud, schemas
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", "100")) # rows reported back; the rest are only counted
+
+CSV_CONTENT_TYPES = {"text/csv"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_REQUIRED_COLUMNS = {"description", "amount", "expense_date", "payer_id"}
+
+async def _split_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yields (line number, line) for every line of a byte stream, blank ones included."""
+    pending = b""
+    line_no = 0
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+    if pending:
+        yield line_no + 1, pending
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yields (line number, line) for every non-blank line of a byte stream."""
+    async for line_no, line in _split_lines(chunks):
+        if line.strip():
+            yield line_no, line.rstrip(b"\r")
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yields (first line number, record) for every non-blank CSV record of a byte stream. A
+    quoted field may span lines: a record ends at the first line break outside quotes,
+    i.e. once it holds an even number of quote characters ("" escapes count twice).
+    """
+    lines: List[bytes] = []
+    start = size = quotes = 0
+    async for line_no, line in _split_lines(chunks):
+        if not lines:
+            if not line.strip():
+                continue
+            start = line_no
+        lines.append(line)
+        size += len(line) + 1
+        quotes += line.count(b'"')
+        # An unbalanced quote must not buffer the rest of the body: past the csv module's
+        # own field limit the record is handed on, and its parse fails
+        if quotes % 2 == 0 or size > csv.field_size_limit():
+            yield start, b"\n".join(lines).rstrip(b"\r")
+            lines, size, quotes = [], 0, 0
+    if lines:
+        yield start, b"\n".join(lines).rstrip(b"\r")
+
+def _describe_error(exc: ValueError) -> str:
+    """One-line message for a rejected row."""
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in exc.errors())
+    return str(exc)
+
+def _parse_csv_shares(value: str) -> List[Dict[str, str]]:
+    """Parses "2:7.50;3:2.50" into ShareBase dicts."""
+    shares = []
+    for part in filter(None, (p.strip() for p in value.split(";"))):
+        member_id, sep, amount = part.partition(":")
+        if not sep:
+            raise ValueError(f"Share {part!r} is not member_id:amount")
+        shares.append({"member_id": member_id.strip(), "amount": amount.strip()})
+    return shares
+
+def _csv_row_parser(header_line: bytes, group_id: int) -> Callable[[bytes], schemas.ExpenseCreate]:
+    """Reads the header row and returns a parser for the data rows that follow it."""
+    header = [name.strip() for name in next(csv.reader([header_line.decode("utf-8-sig")]))]
+    missing = CSV_REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {sorted(missing)}")
+
+    def parse(record: bytes) -> schemas.ExpenseCreate:
+        # strict: a quote left open at the end of the record is an error, not a short field
+        values = next(csv.reader([record.decode("utf-8")], strict=True))
+        if len(values) != len(header):
+            raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+        row = dict(zip(header, values))
+        row["shares"] = _parse_csv_shares(row.get("shares") or "")
+        row["group_id"] = group_id
+        return schemas.ExpenseCreate.model_validate(row)
+    return parse
+
+def _ndjson_row_parser(group_id: int) -> Callable[[bytes], schemas.ExpenseCreate]:
+    def parse(line: bytes) -> schemas.ExpenseCreate:
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError("Expected a JSON object")
+        if row.setdefault("group_id", group_id) != group_id:
+            raise ValueError(f"group_id {row['group_id']} does not match the import's group {group_id}")
+        row.setdefault("shares", [])
+        return schemas.ExpenseCreate.model_validate(row)
+    return parse
+
+async def import_expenses(
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    group_id: int,
+    db: Session,
+    current_user_id: int,
+    batch_size: Optional[int] = None,
+) -> schemas.ExpenseImportResult:
+    """
+    Validates rows as they arrive and writes them IMPORT_BATCH_SIZE at a time, each batch
+    in its own transaction on a worker thread. Invalid rows are skipped and reported; a
+    batch that commits stays committed even if a later one fails. Raises ValueError for an
+    unusable body (unknown content type, bad CSV header) before anything is written.
+    """
+    if content_type in CSV_CONTENT_TYPES:
+        parse = None # set once the header row arrives
+        records = iter_csv_records(chunks)
+    elif content_type in NDJSON_CONTENT_TYPES:
+        parse = _ndjson_row_parser(group_id)
+        records = iter_lines(chunks)
+    else:
+        raise ValueError(f"Unsupported content type {content_type!r}; send text/csv or application/x-ndjson")
+
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    member_ids = await run_in_threadpool(crud.get_group_member_ids, db, group_id)
+    result = schemas.ExpenseImportResult()
+
+    def reject(line_no: int, error: str):
+        result.failed += 1
+        if len(result.errors) < IMPORT_MAX_ERRORS:
+            result.errors.append(schemas.ExpenseImportError(line=line_no, error=error))
+        else:
+            result.errors_truncated = True
+
+    async def flush(batch):
+        rejected = await run_in_threadpool(
+            crud.import_expense_batch, db, group_id, batch, member_ids, current_user_id
+        )
+        result.imported += len(batch) - len(rejected)
+        result.batches += 1
+        for line_no, error in rejected:
+            reject(line_no, error)
+
+    batch: List[Tuple[int, schemas.ExpenseCreate]] = []
+    async for line_no, record in records:
+        if parse is None:
+            parse = _csv_row_parser(record, group_id)
+            continue
+        try:
+            batch.append((line_no, parse(record)))
+        except (ValueError, csv.Error) as exc:
+            reject(line_no, _describe_error(exc))
+            continue
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    result.errors.sort(key=lambda err: err.line) # parse errors are found before the batch's write errors
+    return result
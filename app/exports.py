@@ -0,0 +1,97 @@
+"""
+Streaming CSV/NDJSON exports of a group's expenses and audit trail. Rows come off a
+server-side cursor and are written out as they arrive, so memory stays flat and the
+first bytes go out long before the last row is read.
+
+The expense CSV uses the bulk import's columns and shares notation (app/expense_import.py),
+so an export can be loaded back in.
+"""
+import csv
+import datetime
+import io
+import json
+import os
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from sqlalchemy.orm import Session
+
+from . import crud, money
+from .database import SessionLocal
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000")) # rows per cursor fetch and per chunk sent
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+EXPENSE_COLUMNS = ["id", "description", "amount", "expense_date", "payer_id", "creator_id", "timestamp", "shares"]
+AUDIT_TRAIL_COLUMNS = ["id", "timestamp", "user_id", "action", "expense_id", "recurring_expense_id", "old_value", "new_value"]
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, dict): # audit payloads
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, list): # shares, as the import reads them: "member_id:amount;..."
+        return ";".join(f"{share['member_id']}:{share['amount']}" for share in value)
+    return value
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value) # same as the API's Money fields
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _stream(fetch: Callable[[Session], Iterable[Dict[str, Any]]], columns: List[str], fmt: str) -> Iterator[str]:
+    """
+    Encodes the records from fetch as CSV or NDJSON, EXPORT_BATCH_SIZE records per chunk.
+    Uses a session of its own: the request's session is closed before a streamed body is sent.
+    """
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if fmt == "csv":
+            writer.writerow(columns)
+            yield buffer.getvalue() # headers and first bytes out before the query runs
+            buffer.seek(0)
+            buffer.truncate()
+
+        for count, record in enumerate(fetch(db), 1):
+            if fmt == "csv":
+                writer.writerow([_csv_value(record[column]) for column in columns])
+            else:
+                buffer.write(json.dumps(record, default=_json_default))
+                buffer.write("\n")
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+def export_group_expenses(group_id: int, fmt: str) -> Iterator[str]:
+    def fetch(db: Session):
+        for row, shares in crud.iter_group_expenses(db, group_id, batch_size=EXPORT_BATCH_SIZE):
+            yield {
+                "id": row.id,
+                "description": row.description,
+                "amount": money.from_cents(row.amount_cents),
+                "expense_date": row.expense_date,
+                "payer_id": row.payer_id,
+                "creator_id": row.creator_id,
+                "timestamp": row.timestamp,
+                "shares": [{"member_id": member_id, "amount": money.from_cents(cents)} for member_id, cents in shares],
+            }
+    return _stream(fetch, EXPENSE_COLUMNS, fmt)
+
+def export_group_audit_trail(group_id: int, fmt: str) -> Iterator[str]:
+    def fetch(db: Session):
+        for row in crud.iter_group_audit_trail(db, group_id, batch_size=EXPORT_BATCH_SIZE):
+            yield row._asdict()
+    return _stream(fetch, AUDIT_TRAIL_COLUMNS, fmt)
@@ -12,18 +12,47 @@
 # from .auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
 # from .schemas import GroupBalance
 # LAST_UPDATE_20250926_A
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import Annotated, List
+from typing import Annotated, List, Literal, Optional, Union
+import datetime
+import os
+from contextlib import asynccontextmanager
 from datetime import timedelta
 
-from . import schemas, crud, auth, models
-from .database import get_db
-from .dependencies import get_current_user, get_current_group_member, verify_group_admin, get_group_with_access_check, verify_group_owner
+from . import schemas, crud, auth, models, async_routes, audit, audit_partitions, expense_import, exports, recurring_scheduler, query_stats, request_metrics
+from .database import get_db, pool_stats, USE_ASYNC_DB
+from .metrics import registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .dependencies import get_current_user, get_current_user_id, get_current_group_member, verify_group_admin, get_group_with_access_check, verify_group_owner
 from .auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-
-app = FastAPI()
+from .pagination import encode_cursor, decode_cursor
+from .schema_check import check_schema_is_current
+
+# Refuse to serve traffic against a database that is behind the migrations in migrations/
+SCHEMA_CHECK_ON_STARTUP = os.environ.get("SCHEMA_CHECK_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SCHEMA_CHECK_ON_STARTUP:
+        check_schema_is_current()
+    audit_partitions.maintain_partitions(retention=False) # months ahead exist before traffic arrives
+    recurring_scheduler.scheduler.start() # only with RECURRING_SCHEDULER_INTERVAL_SECONDS set
+    yield
+    recurring_scheduler.scheduler.stop()
+    audit.writer.flush() # AUDIT_DURABILITY=eventual: write what is still queued before exiting
+
+app = FastAPI(lifespan=lifespan)
+# Server-Timing (queries, DB time) on every response; slow statements logged with their route
+app.add_middleware(query_stats.QueryStatsMiddleware)
+# Latency per route template and requests in progress, for GET /metrics
+app.add_middleware(request_metrics.RequestMetricsMiddleware)
+
+# With USE_ASYNC_DB the async variants are registered first, so they take precedence
+# over the sync routes below that share the same method and path
+if USE_ASYNC_DB:
+    app.include_router(async_routes.router)
 
 @app.get("/test")
 def test_endpoint():
@@ -57,28 +86,42 @@ async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], 
     db: Session = Depends(get_db)
 ):
-    user = crud.authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await auth.authenticate_user_async(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    auth.verify_password(form_data.password, user.hashed_password)
 
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Then add your logout route
 @app.post("/auth/logout")
-def logout_user(current_user: models.User = Depends(get_current_user)):
+def logout_user(current_user: schemas.Principal = Depends(get_current_user)):
     return {"message": f"Logout successful for user {current_user.email}"}
 
+@app.get("/auth/cache-stats")
+def read_principal_cache_stats(current_user: schemas.Principal = Depends(get_current_user)):
+    """Hit/miss counters of the token -> principal cache in this worker."""
+    return auth.principal_cache.stats()
+
+@app.get("/db/pool-stats")
+def read_pool_stats(current_user: schemas.Principal = Depends(get_current_user)):
+    """Connection pool occupancy, counters and checkout timings for this worker."""
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """This worker's metrics in the Prometheus text format, for scraping."""
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 # @app.post("/users/logout")
-# def logout_user(current_user: models.User = Depends(get_current_user)):
+# def logout_user(current_user: schemas.Principal = Depends(get_current_user)):
 #     """
 #     Logs out the user by confirming the token is valid, then instructing the client 
 #     to discard the token (since JWTs are stateless).
@@ -86,14 +129,34 @@ def logout_user(current_user: models.User = Depends(get_current_user)):
 #     return {"message": f"Logout successful for user {current_user.email}. Please discard the access token."}
 
 @app.get("/me", response_model=schemas.User)
-def read_current_user_profile(current_user: models.User = Depends(get_current_user)):
+def read_current_user_profile(db: Session = Depends(get_db), current_user: schemas.Principal = Depends(get_current_user)):
     """Get the current authenticated user's profile details."""
-    return current_user 
+    return crud.get_user_by_id(db, user_id=current_user.id)
+
+@app.post("/me/deactivate", response_model=schemas.User)
+def deactivate_current_user(db: Session = Depends(get_db), current_user: schemas.Principal = Depends(get_current_user)):
+    """
+    Deactivate the current user's account. Their tokens stop working at once in this worker,
+    and in other workers within PRINCIPAL_CACHE_TTL_SECONDS (their cached principals' TTL).
+    """
+    return crud.deactivate_user(db, user_id=current_user.id)
 
 # Get all users
 @app.get("/users/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
+def read_users(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """List users by id. Pass the X-Next-Cursor header of a page as ?cursor= to fetch the next one."""
+    after_id = None
+    if cursor is not None:
+        try:
+            (after_id,) = decode_cursor(cursor, 1)
+            after_id = int(after_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    # One extra row tells whether there is a next page, so the last page gets no cursor
+    users = crud.get_users(db, skip=skip, limit=limit + 1, after_id=after_id)
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(users[-1].id)
     return users
 
 @app.get("/users/{user_id}", response_model=schemas.User)
@@ -107,14 +170,25 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
 # # --- Group Routes ---  
 
 @app.post("/groups/", response_model=schemas.Group, status_code=status.HTTP_201_CREATED)
-def create_group_route(group: schemas.GroupCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def create_group_route(group: schemas.GroupCreate, db: Session = Depends(get_db), current_user_id: int = Depends(get_current_user_id)):
     """Create a new expense group, making the creator the admin."""
-    return crud.create_group(db=db, group=group, admin_id=current_user.id)
+    return crud.create_group(db=db, group=group, admin_id=current_user_id)
 
-@app.get("/groups/{group_id}", response_model=schemas.Group)
-def read_group(group_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    """Get a specific group by ID (requires membership in a real app)."""
-    db_group = crud.get_group_by_id(db, group_id=group_id)
+@app.get("/groups/{group_id}", response_model=Union[schemas.GroupSummary, schemas.Group])
+def read_group(
+    group_id: int,
+    summary: bool = False,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user)
+):
+    """Get a specific group by ID (requires membership in a real app).
+
+    With ?summary=true only counts and totals are returned instead of the member and expense lists.
+    """
+    if summary:
+        db_group = crud.get_group_summary(db, group_id=group_id)
+    else:
+        db_group = crud.get_group_detail(db, group_id=group_id)
     if db_group is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
     # In a real app, you would check if current_user is a member before returning
@@ -125,7 +199,7 @@ def read_group(group_id: int, db: Session = Depends(get_db), current_user: model
 # def create_group_route(
 #     group: schemas.GroupCreate, 
 #     db: Session = Depends(get_db), 
-#     current_user: models.User = Depends(get_current_user)
+#     current_user: schemas.Principal = Depends(get_current_user)
 # ):
 #     """Create a new expense group, making the creator the admin."""
 #     return crud.create_group(db=db, group=group, admin_id=current_user.id)
@@ -140,7 +214,7 @@ def read_group(group_id: int, db: Session = Depends(get_db), current_user: model
 # # --- Group Member Routes ---
 
 # # @app.post("/groups/{group_id}/members/{user_id}", response_model=schemas.GroupMember, status_code=status.HTTP_201_CREATED)
-# # def add_member_to_group(group_id: int, user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+# # def add_member_to_group(group_id: int, user_id: int, db: Session = Depends(get_db), current_user: schemas.Principal = Depends(get_current_user)):
 # #     """Add a new member to a group (requires membership or admin in a real app)."""
 # #     group = crud.get_group_by_id(db, group_id)
 # #     if not group:
@@ -157,7 +231,7 @@ def read_group(group_id: int, db: Session = Depends(get_db), current_user: model
 # #     return schemas.GroupMember(user_id=user_id, is_admin=db_member.is_admin)
 
 # @app.post("/groups/{group_id}/members/{user_id}", response_model=schemas.GroupMember, status_code=status.HTTP_201_CREATED)
-# def add_member_to_group(group_id: int, user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+# def add_member_to_group(group_id: int, user_id: int, db: Session = Depends(get_db), current_user: schemas.Principal = Depends(get_current_user)):
                                                                                                   
 #     """Add a new member to a group (requires the inviting user to be authenticated)."""
 #     group = crud.get_group_by_id(db, group_id)
@@ -183,7 +257,7 @@ def add_member_to_group(
     group_id: int, 
     user_id: int, 
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_user)
 ):
     """Add a new member to a group (requires only authentication)."""
     user_to_add = crud.get_user_by_id(db, user_id)
@@ -233,14 +307,17 @@ def remove_member_from_group(
 def create_expense_route(
     expense: schemas.ExpenseCreate, 
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
     """Create a new expense in a group."""
     group = crud.get_group_by_id(db, expense.group_id)
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
-    
-    return crud.create_expense(db=db, expense=expense, current_user_id=current_user.id)
+
+    try:
+        return crud.create_expense(db=db, expense=expense, current_user_id=current_user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 
 @app.put("/expenses/{expense_id}", response_model=schemas.Expense)
@@ -248,7 +325,7 @@ def update_expense_route(
     expense_id: int,
     expense_update: schemas.ExpenseUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_user)
 ):
     """Update an expense (requires user to be payer or group admin)."""
     db_expense = crud.get_expense_by_id(db, expense_id)
@@ -260,14 +337,17 @@ def update_expense_route(
         if not (group and group.admin_id == current_user.id):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this expense")
 
-    return crud.update_expense(db=db, expense_id=expense_id, expense_update=expense_update, current_user_id=current_user.id)
+    try:
+        return crud.update_expense(db=db, expense_id=expense_id, expense_update=expense_update, current_user_id=current_user.id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 
 @app.delete("/expenses/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_expense_route(
     expense_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_user)
 ):
     """Delete an expense (requires user to be payer or group admin)."""
     db_expense = crud.get_expense_by_id(db, expense_id)
@@ -282,16 +362,55 @@ def delete_expense_route(
     crud.delete_expense(db=db, expense_id=expense_id, current_user_id=current_user.id)
     return
 
+@app.get("/groups/{group_id}/expenses/export")
+def export_expenses_route(
+    group_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    group: models.Group = Depends(get_group_with_access_check)
+):
+    """Download all of a group's expenses, streamed. The CSV can be fed back to the import."""
+    return StreamingResponse(
+        exports.export_group_expenses(group_id, format),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="group-{group_id}-expenses.{format}"'}
+    )
+
+@app.post("/groups/{group_id}/expenses/import", response_model=schemas.ExpenseImportResult)
+async def import_expenses_route(
+    group_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    group: models.Group = Depends(get_group_with_access_check),
+    current_user: schemas.Principal = Depends(get_current_user)
+):
+    """Bulk-import expenses into a group from a streamed CSV or NDJSON body (see app/expense_import.py).
+
+    Valid rows are committed in batches; rejected rows are reported by line number.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in expense_import.CSV_CONTENT_TYPES | expense_import.NDJSON_CONTENT_TYPES:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Send text/csv or application/x-ndjson")
+
+    try:
+        return await expense_import.import_expenses(request.stream(), content_type, group_id, db, current_user.id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
 # --- Balance Routes ---
 
 @app.get("/groups/{group_id}/balances", response_model=schemas.GroupBalance)
-def get_group_balances(group_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def get_group_balances(
+    group_id: int,
+    minimize_transactions: bool = False,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user)
+):
     """Calculate the simplified net balances for a group (who owes whom)."""
     db_group = crud.get_group_by_id(db, group_id)
     if db_group is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
         
-    balances = crud.simplify_balances(db, group_id)
+    balances = crud.simplify_balances(db, group_id, minimize_transactions=minimize_transactions)
     
     return schemas.GroupBalance(group_id=group_id, balances=balances)
 
@@ -303,7 +422,7 @@ def create_recurring_expense_route(
     group_id: int,
     recurring_expense: schemas.RecurringExpenseCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_group_member) 
+    member_record: models.GroupMember = Depends(get_current_group_member)
 ):
     """Sets up a new recurring expense for the group."""
     if recurring_expense.group_id != group_id:
@@ -327,32 +446,77 @@ def create_recurring_expense_route(
             detail="Member list must be unique and non-empty."
         )
 
-    return crud.create_recurring_expense(db=db, recurring_expense=recurring_expense, creator_id=current_user.id)
+    return crud.create_recurring_expense(db=db, recurring_expense=recurring_expense, creator_id=member_record.user_id)
 
 @app.get("/groups/{group_id}/recurring-expenses", response_model=List[schemas.RecurringExpense])
 def read_recurring_expenses(
     group_id: int,
+    member_id: Optional[int] = Query(None, description="Only recurring expenses split with this member"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_user)
 ):
-    """View all recurring expenses for a group."""
+    """View all recurring expenses for a group, optionally only those split with one member."""
     group = crud.get_group_by_id(db, group_id)
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
 
-    return crud.get_recurring_expenses_for_group(db, group_id=group_id)
+    return crud.get_recurring_expenses_for_group(db, group_id=group_id, member_id=member_id)
 
 
 # --- Audit Trail Route ---
 
+@app.get("/groups/{group_id}/audit-trail/export")
+def export_audit_trail_route(
+    group_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    current_admin: models.User = Depends(verify_group_admin)
+):
+    """As a group admin, download the whole audit trail oldest first, streamed."""
+    return StreamingResponse(
+        exports.export_group_audit_trail(group_id, format),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="group-{group_id}-audit-trail.{format}"'}
+    )
+
 @app.get("/groups/{group_id}/audit-trail", response_model=List[schemas.AuditTrail])
 def view_audit_trail(
     group_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    expense_id: Optional[int] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    payload: List[str] = Query([], description='e.g. "new_value.payer_id=3" or "new_value.amount>=100"; repeat to combine'),
     db: Session = Depends(get_db),
     current_admin: models.User = Depends(verify_group_admin) # Ensures only the group admin can access
 ):
-    """As a group admin, view a detailed audit trail of all changes."""
-    return crud.get_audit_trail_for_group(db, group_id=group_id, skip=skip, limit=limit)
+    """As a group admin, view a detailed audit trail of all changes.
+
+    Newest first. Pass the X-Next-Cursor header of a page as ?cursor= to fetch the next one,
+    with the same filters. since is inclusive, until exclusive; each payload filter compares
+    a key of old_value or new_value (= != < <= > >=).
+    """
+    try:
+        predicates = [crud.parse_audit_predicate(predicate) for predicate in payload]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    before = None
+    if cursor is not None:
+        try:
+            timestamp, entry_id = decode_cursor(cursor, 2)
+            before = (datetime.datetime.fromisoformat(timestamp), int(entry_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    entries = crud.get_audit_trail_for_group(
+        db, group_id=group_id, skip=skip, limit=limit + 1, before=before, action=action, user_id=user_id,
+        expense_id=expense_id, since=since, until=until, payload=predicates
+    )
+    if len(entries) > limit:
+        entries = entries[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(entries[-1].timestamp, entries[-1].id)
+    return entries
 
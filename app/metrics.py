@@ -0,0 +1,188 @@
+"""
+Minimal in-process metric primitives (counters, gauges and fixed-bucket histograms) and a
+registry that renders them in the Prometheus text format for GET /metrics.
+
+Updates take no lock: every thread adds to its own shard of a metric, and readers sum the
+shards. A thread's shard is created (under the metric's lock) the first time that thread
+touches the metric, which with pooled threads happens once per worker thread.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; suits both DB checkouts and request latencies
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class _Sharded:
+    """Per-thread lists of numbers; only the owning thread writes to its list."""
+
+    def __init__(self, width: int):
+        self._width = width
+        self._shards: List[list] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _shard(self) -> list:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self._width
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _totals(self) -> list:
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self._width
+
+class Counter(_Sharded):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: int = 1):
+        self._shard()[0] += amount
+
+    @property
+    def value(self) -> int:
+        return self._totals()[0]
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in progress (the sum of each thread's +/-)."""
+
+    kind = "gauge"
+
+    def dec(self, amount: int = 1):
+        self._shard()[0] -= amount
+
+class CallbackGauge:
+    """Gauge whose value is read from a function when the metrics are collected."""
+
+    kind = "gauge"
+
+    def __init__(self, function: Callable[[], float]):
+        self.function = function
+
+    @property
+    def value(self) -> float:
+        return self.function()
+
+class Histogram(_Sharded):
+    """Distribution of observed values over fixed upper bounds, Prometheus style."""
+
+    kind = "histogram"
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(len(self.buckets) + 2) # one count per bucket, +Inf, then the sum
+
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Dict:
+        """Returns cumulative bucket counts keyed by upper bound, plus count and sum."""
+        totals = self._totals()
+        cumulative, running = {}, 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], totals):
+            running += count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": running, "sum": totals[-1]}
+
+class Family:
+    """
+    One metric per combination of label values, e.g. a latency Histogram per route. Children
+    are made by factory on first use, or added ready-made (CallbackGauges) with add().
+    """
+
+    def __init__(self, labelnames: Sequence[str], factory: Optional[Callable[[], object]] = None, kind: Optional[str] = None):
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self.kind = kind or factory().kind
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> object:
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if self._factory is None:
+                raise KeyError(f"No child labelled {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def add(self, child, *values):
+        with self._lock:
+            self._children[tuple(str(value) for value in values)] = child
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    pairs = [f'{name}="{value}"' for name, value in zip(names, escaped)] + ([extra] if extra else [])
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _samples(name: str, metric, names: Sequence[str], values: Sequence[str]) -> Iterator[str]:
+    if isinstance(metric, Histogram):
+        snapshot = metric.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            le = f'le="{bound}"'
+            yield f"{name}_bucket{_format_labels(names, values, le)} {count}"
+        yield f"{name}_sum{_format_labels(names, values)} {snapshot['sum']}"
+        yield f"{name}_count{_format_labels(names, values)} {snapshot['count']}"
+    else:
+        yield f"{name}{_format_labels(names, values)} {metric.value}"
+
+class Registry:
+    """Named metrics to expose; each module registers the series it updates."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Tuple[str, str, object]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, documentation: str, metric):
+        """Exposes an existing metric (or Family) under name; returns it."""
+        with self._lock:
+            if name in self._metrics:
+                raise ValueError(f"Metric {name} is already registered")
+            self._metrics[name] = (documentation, metric.kind, metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self.register(name, documentation, Family(labelnames, Counter) if labelnames else Counter())
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self.register(name, documentation, Family(labelnames, Gauge) if labelnames else Gauge())
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        factory = lambda: Histogram(buckets)
+        return self.register(name, documentation, Family(labelnames, factory) if labelnames else factory())
+
+    def render(self) -> str:
+        """The Prometheus text exposition of every registered metric."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, (documentation, kind, metric) in metrics:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            if isinstance(metric, Family):
+                for values, child in sorted(metric.children(), key=lambda item: item[0]):
+                    lines.extend(_samples(name, child, metric.labelnames, values))
+            else:
+                lines.extend(_samples(name, metric, (), ()))
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
@@ -1,12 +1,30 @@
 import enum
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, Table, Enum, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Float, Table, Enum, Date, Index, UniqueConstraint, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column 
+from decimal import Decimal
+from typing import List, Optional
+from .money import to_cents, from_cents
 
 Base = declarative_base()
 
+# JSONB on PostgreSQL (indexable, see AuditTrail), JSON text elsewhere
+JSONPayload = JSON().with_variant(JSONB(), "postgresql")
+
+class CentsAmountMixin:
+    """Exposes the integer amount_cents column as a Decimal `amount` attribute."""
+
+    @property
+    def amount(self) -> Optional[Decimal]:
+        return None if self.amount_cents is None else from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = None if value is None else to_cents(value)
+
 
 # group_members_table = Table(
 #     'group_members',
@@ -18,7 +36,11 @@ Base = declarative_base()
 class GroupMember(Base):
     """Association object for the many-to-many relationship between User and Group."""
     __tablename__ = 'group_members'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # The PK covers group -> members; this covers user -> groups (get_user_groups)
+        Index("ix_group_members_user_group", "user_id", "group_id"),
+        {'extend_existing': True},
+    )
     
     group_id = Column(Integer, ForeignKey('groups.id'), primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
@@ -44,13 +66,13 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
 
-    expenses_created = relationship("Expense", back_populates="payer")
+    expenses_created = relationship("Expense", back_populates="payer", foreign_keys="Expense.payer_id")
     groups_administered = relationship("Group", back_populates="admin")
     groups_joined = relationship("Group", secondary="group_members", back_populates="members")
    
     group_memberships = relationship("GroupMember", back_populates="member")
     audit_trails = relationship("AuditTrail", back_populates="user") 
-    recurring_expenses_created = relationship("RecurringExpense", back_populates="payer")
+    recurring_expenses_created = relationship("RecurringExpense", back_populates="payer", foreign_keys="RecurringExpense.payer_id")
  
 class Group(Base):
     __tablename__ = "groups"
@@ -68,25 +90,79 @@ class Group(Base):
     audit_trails = relationship("AuditTrail", back_populates="group")
     recurring_expenses = relationship("RecurringExpense", back_populates="group")
 
-class Expense(Base):
+class Expense(CentsAmountMixin, Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Per-group expense scans and per-payer totals; INCLUDE lets PostgreSQL sum amounts from the index alone
+        Index("ix_expenses_group_payer", "group_id", "payer_id", postgresql_include=["amount_cents"]),
+        # One expense per occurrence of a recurring expense, however often the scheduler runs
+        UniqueConstraint("recurring_expense_id", "occurrence_date", name="uq_expenses_recurring_occurrence"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String)
-    amount = Column(Float)
+    amount_cents = Column(BigInteger, nullable=False) # integer minor units; use .amount for a Decimal
+    expense_date = Column(Date)
     timestamp = Column(DateTime, server_default=func.now())
     
     payer_id = Column(Integer, ForeignKey("users.id"))
     group_id = Column(Integer, ForeignKey("groups.id"))
     creator_id = Column(Integer, ForeignKey("users.id"))
+    # Set on expenses materialized from a recurring expense (app/recurring_scheduler.py)
+    recurring_expense_id = Column(Integer, ForeignKey("recurring_expenses.id", ondelete="SET NULL"), nullable=True)
+    occurrence_date = Column(Date, nullable=True)
 
-    creator = relationship("User", back_populates="expenses_created")
-    payer = relationship("User", back_populates="expenses_created")
+    creator = relationship("User", foreign_keys=[creator_id])
+    payer = relationship("User", back_populates="expenses_created", foreign_keys=[payer_id])
     group = relationship("Group", back_populates="expenses")
+    # Always serialized with the expense, so load them in one batched query per set of expenses
+    shares = relationship("ExpenseShare", back_populates="expense", lazy="selectin",
+                          cascade="all, delete-orphan", passive_deletes=True)
+
+class ExpenseShare(CentsAmountMixin, Base):
+    """The part of one expense a member owes. The shares of an expense add up to its amount."""
+    __tablename__ = "expense_shares"
+    __table_args__ = (
+        UniqueConstraint("expense_id", "member_id", name="uq_expense_shares_expense_member"),
+        # Balance aggregation: SUM(amount_cents) per member of a group, answered from the index
+        Index("ix_expense_shares_group_member", "group_id", "member_id", postgresql_include=["amount_cents"]),
+    )
+
+    id = Column(Integer, primary_key=True)
+    expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False) # copied from the expense for per-group sums
+    member_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
+
+    expense = relationship("Expense", back_populates="shares")
+
+
+class MemberBalance(Base):
+    """Materialized net balance of one user inside one group.
+
+    Positive means the group owes the user, negative means the user owes the group.
+    Maintained incrementally by the expense CRUD functions from each expense's shares.
+    """
+    __tablename__ = "member_balances"
+
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    net_balance_cents = Column(BigInteger, nullable=False, default=0)
 
 
 class AuditTrail(Base):
+    # On PostgreSQL this is partitioned by month on timestamp, with primary key (id, timestamp);
+    # see migration 0005 and app/audit_partitions.py
     __tablename__ = "audit_trail"
+    __table_args__ = (
+        # Matches the group audit listing: WHERE group_id = ? ORDER BY timestamp DESC, id DESC
+        Index("ix_audit_trail_group_timestamp", "group_id", "timestamp", "id"),
+        # Audit searches (crud.get_audit_trail_for_group): by action, by expense, by payload contents
+        Index("ix_audit_trail_group_action_timestamp", "group_id", "action", "timestamp", "id"),
+        Index("ix_audit_trail_expense_id", "expense_id"),
+        Index("ix_audit_trail_old_value", "old_value", postgresql_using="gin", postgresql_ops={"old_value": "jsonb_path_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_audit_trail_new_value", "new_value", postgresql_using="gin", postgresql_ops={"new_value": "jsonb_path_ops"}).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -95,21 +171,28 @@ class AuditTrail(Base):
     recurring_expense_id = Column(Integer, ForeignKey("recurring_expenses.id", ondelete="CASCADE"), nullable=True) 
 
     action = Column(String)  # e.g., "created", "updated", "deleted"
-    old_value = Column(String, nullable=True) # Storing as a string for simplicity
-    new_value = Column(String, nullable=True) # Storing as a string for simplicity
-    timestamp = Column(DateTime, server_default=func.now())
+    old_value = Column(JSONPayload, nullable=True)
+    new_value = Column(JSONPayload, nullable=True)
+    timestamp = Column(DateTime, server_default=func.now(), nullable=False) # partition key
 
     user = relationship("User")
     expense = relationship("Expense")
     group = relationship("Group", back_populates="audit_trails") 
     recurring_expense = relationship("RecurringExpense", back_populates="audit_trails") 
 
-class RecurringExpense(Base):
+class RecurringExpense(CentsAmountMixin, Base):
     __tablename__ = "recurring_expenses"
+    __table_args__ = (
+        # The scheduler's due queue: WHERE next_due_date <= today ORDER BY next_due_date, id.
+        # Exhausted schedules have no next_due_date and stay out of the index.
+        Index("ix_recurring_expenses_due", "next_due_date", "id",
+              postgresql_where=text("next_due_date IS NOT NULL"), sqlite_where=text("next_due_date IS NOT NULL")),
+        Index("ix_recurring_expenses_group_id", "group_id"), # a group's schedules (group detail, listing)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String)
-    amount = Column(Float)
+    amount_cents = Column(BigInteger, nullable=False) # integer minor units; use .amount for a Decimal
     
     #frequency = Column(SqlEnum(RecurringFrequency), default=RecurringFrequency.monthly)
     frequency = Column(Enum(RecurringFrequency), default=RecurringFrequency.monthly)
@@ -119,9 +202,29 @@ class RecurringExpense(Base):
     
     payer_id = Column(Integer, ForeignKey("users.id"))
     group_id = Column(Integer, ForeignKey("groups.id"))
+    creator_id = Column(Integer, ForeignKey("users.id"))
+    split_type = Column(String, nullable=False, default="equal") # how occurrences are split among members
+    next_due_date = Column(Date) # the first occurrence not yet materialized as an expense; NULL once past end_date
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
-    payer = relationship("User", back_populates="recurring_expenses_created")
+    payer = relationship("User", back_populates="recurring_expenses_created", foreign_keys=[payer_id])
     group = relationship("Group", back_populates="recurring_expenses")
     audit_trails = relationship("AuditTrail", back_populates="recurring_expense")
+    # Always serialized with the schedule, so load them in one batched query per set of schedules
+    members = relationship("RecurringExpenseMember", lazy="selectin", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def member_ids(self) -> List[int]:
+        return sorted(member.member_id for member in self.members)
+
+class RecurringExpenseMember(Base):
+    """A member who shares the occurrences of a recurring expense."""
+    __tablename__ = "recurring_expense_members"
+    __table_args__ = (
+        # The primary key covers schedule -> members; this covers member -> schedules
+        Index("ix_recurring_expense_members_member", "member_id", "recurring_expense_id"),
+    )
+
+    recurring_expense_id = Column(Integer, ForeignKey("recurring_expenses.id", ondelete="CASCADE"), primary_key=True)
+    member_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
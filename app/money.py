@@ -0,0 +1,32 @@
+"""
+Money helpers. Amounts are stored and computed as integer cents; Decimal is only used
+at the edges (API input/output), so sums and splits are exact.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Union
+
+CENT = Decimal("0.01")
+
+def to_cents(amount: Union[Decimal, int, float, str]) -> int:
+    """Converts a currency amount to integer cents, rounding half-cents away from zero."""
+    if isinstance(amount, float):
+        amount = repr(amount) # shortest round-tripping form, so 0.1 is 0.1 and not 0.1000000000000000055...
+    return int(Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+def from_cents(cents: int) -> Decimal:
+    """Converts integer cents back to a two-place Decimal amount."""
+    return Decimal(cents).scaleb(-2)
+
+def split_evenly(total_cents: int, member_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Splits a non-negative amount of cents as evenly as possible (largest remainder method).
+
+    Every member gets total // n; the total % n leftover cents go one each to the lowest
+    user ids, so the shares always add up to the total exactly.
+    """
+    member_ids = sorted(member_ids)
+    if not member_ids:
+        return {}
+
+    base, leftover = divmod(total_cents, len(member_ids))
+    return {member_id: base + (1 if rank < leftover else 0) for rank, member_id in enumerate(member_ids)}
@@ -0,0 +1,26 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor carries the sort key of the last row of a page; the next page is fetched with
+WHERE key < / > cursor instead of OFFSET, so every page costs the same index seek.
+"""
+import base64
+import datetime
+import json
+from typing import Any, List
+
+def encode_cursor(*values: Any) -> str:
+    """Packs the sort key of a row into a URL-safe token."""
+    payload = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, length: int) -> List[Any]:
+    """Unpacks a cursor made by encode_cursor; raises ValueError for anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("Malformed cursor")
+    return values
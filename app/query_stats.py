@@ -0,0 +1,126 @@
+"""
+Per-request SQL accounting: how many statements each request ran and how long the
+database took, from SQLAlchemy cursor events.
+
+QueryStatsMiddleware reports both in a Server-Timing header, e.g.
+    Server-Timing: db;dur=4.2;desc="7 queries", app;dur=11.9
+and statements slower than SLOW_QUERY_THRESHOLD_MS are logged with the route template
+they ran under and the shape of their parameters (never the values).
+"""
+import contextvars
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from sqlalchemy import event
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200")) # -1 disables the slow-query log
+SLOW_QUERY_MAX_STATEMENT_LENGTH = int(os.environ.get("SLOW_QUERY_MAX_STATEMENT_LENGTH", "1000"))
+
+logger = logging.getLogger(__name__)
+
+class RequestQueryStats:
+    """Statement count and database time of one request."""
+
+    __slots__ = ("scope", "count", "seconds")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        """The matched route's template (/groups/{group_id}), or the raw path before routing."""
+        if self.scope is None:
+            return "-"
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "-")
+
+# Holds a mutable object rather than counters: sync routes run in a worker thread on a
+# copy of the request's context, and must add to the same stats the middleware reads
+_current: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar("request_query_stats", default=None)
+
+def current() -> Optional[RequestQueryStats]:
+    """The stats of the request being served, or None outside a request (scheduler, scripts)."""
+    return _current.get()
+
+def parameters_shape(parameters: Any) -> str:
+    """Describes bound parameters without their values: names, or how many, per row."""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        return f"{len(parameters)} x {parameters_shape(parameters[0])}" # executemany
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(sorted(map(str, parameters))) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return f"({len(parameters)} positional)"
+    return type(parameters).__name__
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if 0 <= SLOW_QUERY_THRESHOLD_MS <= elapsed * 1000:
+        logger.warning(
+            "Slow query (%.1f ms) on %s, parameters %s: %s",
+            elapsed * 1000,
+            stats.route if stats is not None else "-",
+            parameters_shape(parameters),
+            statement[:SLOW_QUERY_MAX_STATEMENT_LENGTH],
+        )
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+def instrument(engine):
+    """Attributes the statements of a sync Engine (or an AsyncEngine's sync_engine) to requests."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def server_timing(stats: RequestQueryStats, total_seconds: float) -> str:
+    return f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", app;dur={total_seconds * 1000:.1f}'
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that collects a RequestQueryStats per HTTP request and adds the
+    Server-Timing header. The header goes out with the response start, so a streamed
+    body's queries (CSV exports) are not in it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, time.perf_counter() - start).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            logger.debug("%s %s: %d queries, %.1f ms in the database",
+                         scope["method"], stats.route, stats.count, stats.seconds * 1000)
@@ -0,0 +1,45 @@
+import argparse
+import sys
+
+from app import crud, models
+from app.money import from_cents
+from app.database import SessionLocal
+
+def rebuild_balances(verify_only: bool = False, group_id: int = None) -> int:
+    """
+    Recomputes the member_balances ledger from the expenses table.
+    With verify_only the ledger is left untouched and drifted members are only reported.
+    Returns the number of groups that had drifted.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(models.Group.id).order_by(models.Group.id)
+        if group_id is not None:
+            query = query.filter(models.Group.id == group_id)
+
+        drifted_groups = 0
+        for (gid,) in query.all():
+            drift = crud.verify_group_ledger(db, gid)
+            if drift:
+                drifted_groups += 1
+                for user_id, values in sorted(drift.items()):
+                    print(f"group {gid} user {user_id}: ledger={from_cents(values['ledger'])} expected={from_cents(values['expected'])}")
+
+            if not verify_only:
+                crud.rebuild_group_ledger(db, gid)
+                db.commit()
+        return drifted_groups
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify the per-member balance ledger.")
+    parser.add_argument("--verify", action="store_true", help="only report drift, do not rewrite the ledger")
+    parser.add_argument("--group-id", type=int, default=None, help="restrict to a single group")
+    args = parser.parse_args()
+
+    drifted = rebuild_balances(verify_only=args.verify, group_id=args.group_id)
+    if args.verify:
+        print(f"{drifted} group(s) with ledger drift.")
+        sys.exit(1 if drifted else 0)
+    print(f"Ledger rebuilt ({drifted} group(s) had drifted).")
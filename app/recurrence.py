@@ -0,0 +1,68 @@
+"""
+Occurrence dates of recurring expenses. Occurrence n of a schedule is always computed
+from its start date, never from the previous occurrence, so a monthly schedule starting
+on the 31st falls on the last day of shorter months and returns to the 31st after them.
+"""
+import calendar
+import datetime
+from typing import List, Optional
+
+from .models import RecurringFrequency
+
+def _add_months(start: datetime.date, months: int) -> datetime.date:
+    year, month_index = divmod(start.month - 1 + months, 12)
+    year += start.year
+    return datetime.date(year, month_index + 1, min(start.day, calendar.monthrange(year, month_index + 1)[1]))
+
+def occurrence(start_date: datetime.date, frequency: RecurringFrequency, index: int) -> datetime.date:
+    """The date of occurrence index (0 is start_date itself)."""
+    if frequency == RecurringFrequency.daily:
+        return start_date + datetime.timedelta(days=index)
+    if frequency == RecurringFrequency.weekly:
+        return start_date + datetime.timedelta(weeks=index)
+    if frequency == RecurringFrequency.monthly:
+        return _add_months(start_date, index)
+    return _add_months(start_date, 12 * index) # yearly
+
+def occurrence_index(start_date: datetime.date, frequency: RecurringFrequency, day: datetime.date) -> int:
+    """The index of the occurrence that falls on day, which must be one of the schedule's."""
+    if frequency == RecurringFrequency.daily:
+        return (day - start_date).days
+    if frequency == RecurringFrequency.weekly:
+        return (day - start_date).days // 7
+    if frequency == RecurringFrequency.monthly:
+        return (day.year - start_date.year) * 12 + day.month - start_date.month
+    return day.year - start_date.year # yearly
+
+def first_due(start_date: datetime.date, end_date: Optional[datetime.date]) -> Optional[datetime.date]:
+    """A new schedule's next_due_date: its start, or None if it ends before it starts."""
+    return None if end_date is not None and start_date > end_date else start_date
+
+def next_due(
+    start_date: datetime.date,
+    end_date: Optional[datetime.date],
+    frequency: RecurringFrequency,
+    after: datetime.date
+) -> Optional[datetime.date]:
+    """The occurrence following after (itself an occurrence), or None past end_date: the schedule is exhausted."""
+    day = occurrence(start_date, frequency, occurrence_index(start_date, frequency, after) + 1)
+    return None if end_date is not None and day > end_date else day
+
+def due_occurrences(
+    start_date: datetime.date,
+    end_date: Optional[datetime.date],
+    frequency: RecurringFrequency,
+    next_due_date: datetime.date,
+    today: datetime.date,
+    limit: int
+) -> List[datetime.date]:
+    """Up to limit occurrence dates from next_due_date through today, stopping after end_date."""
+    last = today if end_date is None else min(today, end_date)
+    dates: List[datetime.date] = []
+    index = occurrence_index(start_date, frequency, next_due_date)
+    day = next_due_date
+    while day <= last and len(dates) < limit:
+        dates.append(day)
+        index += 1
+        day = occurrence(start_date, frequency, index)
+    return dates
@@ -0,0 +1,78 @@
+"""
+Materializes recurring expenses: every occurrence that is due becomes an Expense, with
+shares and ledger updates, through crud.materialize_due_recurring_expenses.
+
+Run it in-process by setting RECURRING_SCHEDULER_INTERVAL_SECONDS, or from cron:
+    python -m app.recurring_scheduler
+
+A run drains the whole due queue, so after downtime it catches up on every missed
+occurrence. Any number of workers and cron jobs may run at once: on PostgreSQL they lease
+different schedules (SKIP LOCKED), and an occurrence is only ever booked once.
+"""
+import datetime
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from . import crud
+from .database import SessionLocal
+
+RECURRING_SCHEDULER_INTERVAL_SECONDS = float(os.environ.get("RECURRING_SCHEDULER_INTERVAL_SECONDS", "0")) # 0: not run in-process
+RECURRING_BATCH_SIZE = int(os.environ.get("RECURRING_BATCH_SIZE", "100")) # schedules leased per transaction
+RECURRING_MAX_OCCURRENCES = int(os.environ.get("RECURRING_MAX_OCCURRENCES", "100")) # per schedule per transaction
+
+logger = logging.getLogger(__name__)
+
+def materialize_due(today: Optional[datetime.date] = None) -> Dict[str, int]:
+    """Materializes everything due up to today, batch after batch; returns the totals."""
+    today = today or datetime.date.today()
+    totals = {"batches": 0, "schedules": 0, "expenses": 0}
+    while True:
+        db = SessionLocal()
+        try:
+            schedules, expenses = crud.materialize_due_recurring_expenses(
+                db, today, batch_size=RECURRING_BATCH_SIZE, max_occurrences=RECURRING_MAX_OCCURRENCES
+            )
+        finally:
+            db.close()
+        if not schedules:
+            return totals
+        totals["batches"] += 1
+        totals["schedules"] += schedules
+        totals["expenses"] += expenses
+
+class RecurringScheduler:
+    """Background thread that calls materialize_due every interval seconds."""
+
+    def __init__(self, interval: float = RECURRING_SCHEDULER_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="recurring-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                totals = materialize_due()
+                if totals["expenses"]:
+                    logger.info("Materialized %(expenses)d recurring expenses from %(schedules)d schedules", totals)
+            except Exception:
+                logger.exception("Recurring expense materialization failed; retrying in %s s", self.interval)
+            self._stop.wait(self.interval)
+
+scheduler = RecurringScheduler()
+
+if __name__ == "__main__":
+    outcome = materialize_due()
+    print(f"Materialized {outcome['expenses']} expenses from {outcome['schedules']} schedules in {outcome['batches']} batches")
@@ -0,0 +1,42 @@
+"""
+HTTP metrics for GET /metrics: request latency per route template and requests in progress.
+
+Routes are labelled by template (/groups/{group_id}), never by raw path, so the number of
+series stays bounded; requests that match no route share the "unmatched" label.
+"""
+import time
+
+from .metrics import registry
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Time to serve a request, including a streamed body", labelnames=("method", "route", "status")
+)
+REQUESTS_IN_PROGRESS = registry.gauge("http_requests_in_progress", "Requests being served by this worker")
+
+class RequestMetricsMiddleware:
+    """ASGI middleware that observes REQUEST_SECONDS and REQUESTS_IN_PROGRESS."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500 # if the app fails before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, status).observe(time.perf_counter() - start)
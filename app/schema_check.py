@@ -0,0 +1,36 @@
+"""
+Compares the database's Alembic revision with the migrations shipped with the code.
+"""
+from pathlib import Path
+from typing import Set, Tuple
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from .database import engine
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def alembic_config() -> Config:
+    """Loads alembic.ini from the project root, independent of the working directory."""
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
+def schema_revisions(bind=engine) -> Tuple[Set[str], Set[str]]:
+    """Returns (revisions applied to the database, head revisions in migrations/)."""
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with bind.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+    return current, heads
+
+def check_schema_is_current(bind=engine):
+    """Raises RuntimeError unless the database is at the latest migration."""
+    current, heads = schema_revisions(bind)
+    if current != heads:
+        raise RuntimeError(
+            f"Database schema is at {sorted(current) or 'no revision'}, code expects {sorted(heads)}. "
+            "Run 'alembic upgrade head' before starting the app."
+        )
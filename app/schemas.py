@@ -1,10 +1,16 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, PlainSerializer
+from typing import Annotated, Any, Optional, List
+from decimal import Decimal
 import datetime
 from enum import Enum
 from datetime import date 
 from . import models as model
 
+# Money is exact (Decimal, two places) in the API and stored as integer cents.
+# JSON output stays a plain number, as it was when amounts were floats.
+Money = Annotated[Decimal, Field(max_digits=14, decimal_places=2), PlainSerializer(float, return_type=float, when_used="json")]
+PositiveMoney = Annotated[Money, Field(gt=0)]
+
 # --- US1: User Schemas ---
 class UserBase(BaseModel):
     email: EmailStr
@@ -63,7 +69,8 @@ class Group(GroupBase):
     
     id: int
     admin_id: int
-    members: List[GroupMemberRecord] = [] # List of members in the group
+    # Read from the GroupMember association rows; Group.members holds plain User objects
+    members: List[GroupMemberRecord] = Field(default=[], validation_alias="group_memberships") # List of members in the group
     expenses: List["Expense"] = []
 
 
@@ -72,6 +79,18 @@ class Group(GroupBase):
     class Config:
         from_attributes = True
 
+class GroupSummary(GroupBase):
+    """Group header with aggregate counts, without the member and expense lists."""
+    id: int
+    admin_id: int
+    member_count: int
+    expense_count: int
+    expense_total: Money
+    recurring_expense_count: int
+
+    class Config:
+        from_attributes = True
+
 # --- US3 & US4: Group Member Management Schemas ---
 
 # class GroupMemberCreate(BaseModel):
@@ -109,7 +128,7 @@ class GroupMemberUpdate(BaseModel):
 # Cost-sharing breakdown for a single member
 class ShareBase(BaseModel):
     member_id: int
-    amount: float # The amount this member owes
+    amount: Money # The amount this member owes
 
 class Share(ShareBase):
     id: int
@@ -125,7 +144,7 @@ class Share(ShareBase):
 #     yearly = "YEARLY"
 class ExpenseBase(BaseModel):
     description: str
-    amount: float
+    amount: PositiveMoney
     expense_date: date
     group_id: int
     payer_id: int
@@ -138,7 +157,7 @@ class ExpenseCreate(ExpenseBase):
     
 class ExpenseUpdate(BaseModel):
     description: Optional[str] = None
-    amount: Optional[float] = None
+    amount: Optional[PositiveMoney] = None
     expense_date: Optional[date] = None
     payer_id: Optional[int] = None
     shares: Optional[List[ShareBase]] = None
@@ -148,10 +167,23 @@ class Expense(ExpenseBase):
     id: int
     creator_id: int # The user who recorded the expense (for US6 ownership check)
     timestamp: datetime.datetime
+    recurring_expense_id: Optional[int] = None # Set when booked from a recurring expense
     
     class Config:
         from_attributes = True
 
+# Result of a bulk import; errors lists the first rejected rows by line number
+class ExpenseImportError(BaseModel):
+    line: int
+    error: str
+
+class ExpenseImportResult(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    batches: int = 0
+    errors: List[ExpenseImportError] = []
+    errors_truncated: bool = False # more rows failed than are listed in errors
+
 # --- US8: Recurring Expense Schemas ---
 # US: As a group member, I can set up recurring expenses ---
 # class RecurringExpenseBase(BaseModel):
@@ -181,7 +213,7 @@ class Expense(ExpenseBase):
 #     yearly = "yearly"
 class RecurringExpenseBase(BaseModel):
     description: str
-    amount: float
+    amount: PositiveMoney
     group_id: int
     frequency: model.RecurringFrequency
     start_date: date
@@ -197,7 +229,9 @@ class RecurringExpense(RecurringExpenseBase):
     payer_id: int
     creator_id: int
     created_at: datetime.datetime
-    split_details_json: str # The serialized split details
+    split_type: str
+    member_ids: List[int] # The members who share each occurrence
+    next_due_date: Optional[date] = None # The next occurrence to be booked as an expense; null once the schedule has ended
 
     class Config:
         from_attributes = True
@@ -211,10 +245,10 @@ class AuditTrailBase(BaseModel):
     user_id: int # The user who performed the action
     group_id: int
     action: str # e.g., 'EXPENSE_CREATED', 'MEMBER_REMOVED'
-    details: Optional[str] # Change details or description
+    details: Optional[str] = None # Change details or description
     expense_id: Optional[int] = None # Associated expense, if applicable
-    old_value: Optional[str] 
-    new_value: Optional[str] 
+    old_value: Optional[Any] = None # JSON: usually an object of the changed fields
+    new_value: Optional[Any] = None
 
 class AuditTrail(AuditTrailBase):
     id: int
@@ -246,7 +280,7 @@ class BalanceDetail(BaseModel):
 
     payer_id: int
     payee_id: int
-    amount: float
+    amount: Money
 
     class Config:
         from_attributes = True
@@ -254,7 +288,7 @@ class BalanceDetail(BaseModel):
 class UserBalance(BaseModel):
     
     user_id: int
-    net_balance: float # Positive means owed to user, negative means user owes
+    net_balance: Money # Positive means owed to user, negative means user owes
 
 class GroupBalance(BaseModel):
     
@@ -271,6 +305,15 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
+class Principal(BaseModel):
+    # Lightweight, session-independent view of the authenticated user
+    id: int
+    email: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
  
 
 # Rebuild models at the end of the file after all classes are defined
@@ -285,6 +328,8 @@ GroupMember.model_rebuild()
 GroupBalance.model_rebuild()
 BalanceDetail.model_rebuild()
 UserBalance.model_rebuild()
+Principal.model_rebuild()
+GroupSummary.model_rebuild()
 
 
 
@@ -0,0 +1,69 @@
+"""
+Debt settlement engine shared by the balance functions in crud.
+
+Balances are integer cents keyed by user id: positive means the user is owed money,
+negative means the user owes money. The engine turns them into a list of transfers
+(payer_id, payee_id, amount_cents) using two priority queues, so a group with n members
+settles in O(n log n) instead of re-sorting both sides after every payment.
+"""
+import heapq
+from collections import defaultdict, deque
+from typing import Dict, List, Tuple
+
+Transfer = Tuple[int, int, int] # (payer_id, payee_id, amount_cents)
+
+def _settle_exact_matches(debtors: List[Tuple[int, int]], creditors: List[Tuple[int, int]]) -> List[Transfer]:
+    """
+    Pairs debtors and creditors whose amounts are exactly equal, since every such pair
+    can be closed with one transfer. Matched entries are removed from both lists in place.
+    """
+    debtors_by_amount: Dict[int, deque] = defaultdict(deque)
+    for debt, debtor_id in sorted(debtors):
+        debtors_by_amount[-debt].append(debtor_id)
+
+    transfers: List[Transfer] = []
+    remaining_creditors = []
+    for credit, creditor_id in sorted(creditors):
+        candidates = debtors_by_amount.get(-credit)
+        if candidates:
+            transfers.append((candidates.popleft(), creditor_id, -credit))
+        else:
+            remaining_creditors.append((credit, creditor_id))
+
+    debtors[:] = [(-amount, debtor_id) for amount, ids in debtors_by_amount.items() for debtor_id in ids]
+    creditors[:] = remaining_creditors
+    return transfers
+
+def settle(balances: Dict[int, int], minimize_transactions: bool = False, tolerance_cents: int = 0) -> List[Transfer]:
+    """
+    Settles net balances greedily: the largest debt always pays the largest credit.
+
+    Ties are broken by user id, so the same balances always give the same transfers.
+    Balances and remainders whose absolute value is at most tolerance_cents are treated
+    as settled. With minimize_transactions, exactly matching debtor/creditor pairs are
+    settled first, which removes transfers the greedy pass would otherwise split.
+    """
+    # Heap entries are (-amount, user_id) so the largest amount pops first
+    debtors = [(balance, user_id) for user_id, balance in balances.items() if balance < -tolerance_cents]
+    creditors = [(-balance, user_id) for user_id, balance in balances.items() if balance > tolerance_cents]
+
+    transfers: List[Transfer] = []
+    if minimize_transactions:
+        transfers.extend(_settle_exact_matches(debtors, creditors))
+
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    while debtors and creditors:
+        debt, debtor_id = heapq.heappop(debtors)
+        credit, creditor_id = heapq.heappop(creditors)
+
+        amount = min(-debt, -credit)
+        transfers.append((debtor_id, creditor_id, amount))
+
+        if -debt - amount > tolerance_cents:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+        if -credit - amount > tolerance_cents:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+
+    return transfers
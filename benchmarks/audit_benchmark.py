@@ -0,0 +1,92 @@
+"""
+Audit pipeline benchmark: request-side commits and latency of POST /expenses/.
+
+Creates --requests expenses one after another against a throwaway SQLite database and
+reports the commits each request made (audit writer commits are counted apart) and the
+latency percentiles. Run it once per durability mode to compare:
+
+Run from the repository root:
+    PYTHONPATH=. python benchmarks/audit_benchmark.py
+    AUDIT_DURABILITY=eventual PYTHONPATH=. python benchmarks/audit_benchmark.py --requests 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "audit.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.main import app # first: app.crud and app.auth import each other
+from app import audit, models
+from app.auth import create_access_token
+from app.create_tables import create_db_and_tables
+from app.database import SessionLocal
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def seed(members):
+    db = SessionLocal()
+    users = [models.User(email=f"audit-{i}@example.com", hashed_password="x") for i in range(members)]
+    db.add_all(users)
+    db.flush()
+    group = models.Group(name="audit", admin_id=users[0].id)
+    db.add(group)
+    db.flush()
+    db.add_all(models.GroupMember(group_id=group.id, user_id=user.id, is_admin=user is users[0]) for user in users)
+    db.commit()
+    result = group.id, users[0].id
+    db.close()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--members", type=int, default=5)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    group_id, payer_id = seed(args.members)
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'audit-0@example.com'})}"}
+
+    commits = {"request": 0, "writer": 0}
+    def count_commit(session):
+        commits["writer" if threading.current_thread().name == "audit-writer" else "request"] += 1
+    event.listen(Session, "after_commit", count_commit)
+
+    client = TestClient(app)
+    latencies = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        response = client.post("/expenses/", headers=headers, json={
+            "description": f"expense {i}", "amount": 12.34, "expense_date": "2025-01-01",
+            "group_id": group_id, "payer_id": payer_id, "shares": [],
+        })
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    audit.writer.flush()
+
+    db = SessionLocal()
+    audit_rows = db.scalar(select(func.count()).select_from(models.AuditTrail).where(models.AuditTrail.action == "EXPENSE_CREATED"))
+    db.close()
+
+    print(f"AUDIT_DURABILITY={audit.AUDIT_DURABILITY} requests={args.requests}")
+    print(f"commits per request={commits['request'] / args.requests:.2f} audit writer commits={commits['writer']}")
+    print(f"latency ms: mean={statistics.mean(latencies):.2f} p50={percentile(latencies, 50):.2f} "
+          f"p99={percentile(latencies, 99):.2f}")
+    ok = audit_rows == args.requests
+    print("ok" if ok else f"FAIL audit rows={audit_rows}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+bcrypt cost benchmark: hashes/sec per core for each BCRYPT_ROUNDS setting.
+
+A login costs one bcrypt verify, which takes as long as one hash with the same cost, so
+hashes/sec per core is also the login capacity per core spent on PASSWORD_HASH_WORKERS.
+
+Run from the repository root:
+    PYTHONPATH=. python benchmarks/bcrypt_cost_benchmark.py
+    PYTHONPATH=. python benchmarks/bcrypt_cost_benchmark.py --rounds 10 11 12 13 --seconds 3 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+PASSWORD = "correct horse battery staple"
+
+def hashes_per_second(context, seconds, workers):
+    """Hashes continuously on `workers` threads for about `seconds` and returns the rate."""
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        count = 0
+        while time.perf_counter() < deadline:
+            context.hash(PASSWORD)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        total = sum(pool.map(lambda _: worker(), range(workers)))
+    return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[8, 10, 11, 12, 13, 14])
+    parser.add_argument("--seconds", type=float, default=2.0, help="measurement time per setting")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="threads for the aggregate column")
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'ms/hash':>9} {'hashes/s/core':>14} {f'hashes/s x{args.workers}':>16}")
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+        context.hash(PASSWORD) # warm up
+
+        per_core = hashes_per_second(context, args.seconds, 1)
+        aggregate = hashes_per_second(context, args.seconds, args.workers)
+        print(f"{rounds:>6} {1000 / per_core:9.1f} {per_core:14.1f} {aggregate:16.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Export benchmark: time to first byte, throughput and peak memory of the streaming
+GET /groups/{id}/expenses/export.
+
+Seeds a throwaway SQLite database with --rows expenses (written through the bulk import
+path), then calls the ASGI app directly and counts the body chunks as they are sent (an
+HTTP client transport would buffer the body and hide the streaming). Time to first byte
+should not depend on --rows, and peak RSS should stay flat as --rows grows. Exits 1 if
+the export is missing rows.
+
+Run from the repository root:
+    PYTHONPATH=. python benchmarks/export_benchmark.py
+    PYTHONPATH=. python benchmarks/export_benchmark.py --rows 1000000 --format ndjson
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import resource
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "export.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from app import crud, models, schemas
+from app.auth import create_access_token
+from app.create_tables import create_db_and_tables
+from app.database import SessionLocal
+from app.main import app
+
+def seed(rows, members, batch_size=5000):
+    """Creates a group with `members` users and `rows` evenly split expenses; returns the group id."""
+    db = SessionLocal()
+    users = [models.User(email=f"export-{i}@example.com", hashed_password="x") for i in range(members)]
+    db.add_all(users)
+    db.flush()
+    group = models.Group(name="export", admin_id=users[0].id)
+    db.add(group)
+    db.flush()
+    db.add_all(models.GroupMember(group_id=group.id, user_id=user.id, is_admin=user is users[0]) for user in users)
+    db.commit()
+
+    group_id, member_ids = group.id, [user.id for user in users]
+    for start in range(0, rows, batch_size):
+        batch = [
+            (i, schemas.ExpenseCreate(description=f"row {i}", amount=f"{1 + i % 5000}.{i % 100:02d}",
+                                      expense_date=datetime.date(2025, 1, 1 + i % 28), group_id=group_id,
+                                      payer_id=member_ids[i % members], shares=[]))
+            for i in range(start, min(start + batch_size, rows))
+        ]
+        crud.import_expense_batch(db, group_id, batch, member_ids, member_ids[0])
+    db.close()
+    return group_id
+
+async def run(args):
+    create_db_and_tables()
+    start = time.perf_counter()
+    group_id = seed(args.rows, args.members)
+    print(f"seeded {args.rows} expenses in {time.perf_counter() - start:.1f}s")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    token = create_access_token(data={"sub": "export-0@example.com"})
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/groups/{group_id}/expenses/export", "raw_path": b"", "root_path": "",
+        "query_string": f"format={args.format}".encode(),
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    first_byte = None
+    status = None
+    lines = size = 0
+
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait() # the client stays connected until the body is complete
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_byte, status, lines, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            lines += message["body"].count(b"\n")
+            size += len(message["body"])
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    if status != 200:
+        print(f"FAIL status={status}")
+        return False
+
+    rows = lines - (1 if args.format == "csv" else 0)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB on Linux
+    print(f"format={args.format} rows={rows} bytes={size:,} ttfb={first_byte * 1000:.1f}ms "
+          f"elapsed={elapsed:.2f}s rows/s={rows / elapsed:,.0f}")
+    print(f"peak RSS before export={rss_before / 1024:.0f} MiB after={rss_after / 1024:.0f} MiB")
+    ok = rows == args.rows
+    print("ok" if ok else f"FAIL expected {args.rows} rows")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
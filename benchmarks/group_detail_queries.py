@@ -0,0 +1,93 @@
+"""
+Measures the group detail load behind GET /groups/{group_id}: SQL statements and time.
+
+Seeds groups of increasing size in a throwaway SQLite database, loads each one the way
+read_group does, walks every attribute schemas.Group serializes, and reports the number
+of statements issued and the load time. tests/test_group_detail_queries.py asserts that
+the count stays flat.
+
+Run from the repository root:
+    PYTHONPATH=. python benchmarks/group_detail_queries.py
+    PYTHONPATH=. python benchmarks/group_detail_queries.py --sizes 10 1000 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "group_detail.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import event
+
+from app import crud, models
+from app.create_tables import create_db_and_tables
+from app.database import SessionLocal, engine
+
+def seed_group(db, size):
+    """Creates a group with `size` members, `size` expenses with shares and a few recurring expenses."""
+    users = [models.User(email=f"g{size}-{i}@example.com", hashed_password="x") for i in range(size)]
+    db.add_all(users)
+    db.flush()
+
+    group = models.Group(name=f"group of {size}", admin_id=users[0].id)
+    db.add(group)
+    db.flush()
+
+    db.add_all(models.GroupMember(group_id=group.id, user_id=user.id, is_admin=user is users[0]) for user in users)
+    db.add_all(
+        models.Expense(description=f"expense {i}", amount=10.0, group_id=group.id,
+                       payer_id=users[i].id, creator_id=users[i].id,
+                       shares=[models.ExpenseShare(group_id=group.id, member_id=users[i].id, amount=10.0)])
+        for i in range(size)
+    )
+    db.add_all(models.RecurringExpense(description="rent", amount=100.0, group_id=group.id,
+                                       payer_id=users[0].id) for _ in range(3))
+    db.commit()
+    return group.id
+
+def touch_serialized_fields(group):
+    """Reads everything schemas.Group would, so any lazy load gets counted."""
+    for membership in group.group_memberships:
+        membership.user_id, membership.is_admin
+    for expense in group.expenses:
+        expense.id, expense.amount, expense.payer_id, expense.creator_id, expense.timestamp
+        for share in expense.shares:
+            share.member_id, share.amount
+    for recurring in group.recurring_expenses:
+        recurring.id, recurring.amount, recurring.frequency, recurring.member_ids
+
+def measure(group_id):
+    """Returns (statements executed, seconds) for one group detail load."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        start = time.perf_counter()
+        touch_serialized_fields(crud.get_group_detail(db, group_id))
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+    return len(statements), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    for size in args.sizes:
+        db = SessionLocal()
+        group_id = seed_group(db, size)
+        db.close()
+
+        queries, elapsed = measure(group_id)
+        print(f"members/expenses={size:>5} queries={queries:>3} load={elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Bulk import benchmark: rows per second and peak memory of POST /groups/{id}/expenses/import.
+
+Streams a generated CSV or NDJSON body through httpx's ASGI transport into a throwaway
+SQLite database, then checks that every row landed and that the balance ledger still
+matches the expenses. Peak RSS should stay flat as --rows grows.
+
+Run from the repository root (needs httpx):
+    PYTHONPATH=. python benchmarks/import_benchmark.py
+    PYTHONPATH=. python benchmarks/import_benchmark.py --rows 200000 --format ndjson
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "import.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx
+
+from app import crud, models
+from app.auth import create_access_token
+from app.create_tables import create_db_and_tables
+from app.database import SessionLocal
+from app.main import app
+
+def seed(members):
+    """Creates a group with `members` users; returns (group_id, member ids)."""
+    db = SessionLocal()
+    users = [models.User(email=f"import-{i}@example.com", hashed_password="x") for i in range(members)]
+    db.add_all(users)
+    db.flush()
+    group = models.Group(name="import", admin_id=users[0].id)
+    db.add(group)
+    db.flush()
+    db.add_all(models.GroupMember(group_id=group.id, user_id=user.id, is_admin=user is users[0]) for user in users)
+    db.commit()
+    result = group.id, [user.id for user in users]
+    db.close()
+    return result
+
+async def body(fmt, rows, member_ids, chunk_rows=500):
+    """Yields the upload a chunk of rows at a time, like a client streaming a file."""
+    if fmt == "csv":
+        yield b"description,amount,expense_date,payer_id\n"
+    lines = []
+    for i in range(rows):
+        payer = member_ids[i % len(member_ids)]
+        amount = f"{1 + i % 5000}.{i % 100:02d}"
+        if fmt == "csv":
+            lines.append(f"row {i},{amount},2025-01-{1 + i % 28:02d},{payer}")
+        else:
+            lines.append(json.dumps({"description": f"row {i}", "amount": amount,
+                                     "expense_date": f"2025-01-{1 + i % 28:02d}", "payer_id": payer}))
+        if len(lines) == chunk_rows:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+async def run(args):
+    create_db_and_tables()
+    group_id, member_ids = seed(args.members)
+    token = create_access_token(data={"sub": "import-0@example.com"})
+    content_type = "text/csv" if args.format == "csv" else "application/x-ndjson"
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post(
+            f"/groups/{group_id}/expenses/import",
+            content=body(args.format, args.rows, member_ids),
+            headers={"Authorization": f"Bearer {token}", "Content-Type": content_type},
+        )
+        elapsed = time.perf_counter() - start
+
+    response.raise_for_status()
+    result = response.json()
+    print(f"format={args.format} rows={args.rows} imported={result['imported']} failed={result['failed']} "
+          f"batches={result['batches']}")
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB on Linux
+    print(f"elapsed={elapsed:.2f}s rows/s={args.rows / elapsed:,.0f} peak RSS={peak_rss / 1024:.0f} MiB")
+
+    db = SessionLocal()
+    drift = crud.verify_group_ledger(db, group_id)
+    db.close()
+    ok = result["imported"] == args.rows and not drift
+    print("ok" if ok else f"FAIL drift={drift}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
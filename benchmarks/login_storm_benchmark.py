@@ -0,0 +1,99 @@
+"""
+Login-storm benchmark: latency of an unrelated endpoint while logins are running.
+
+The app is driven in-process through httpx's ASGI transport against a throwaway SQLite
+database, so anything that blocks the event loop shows up directly in the probe latency.
+
+Run from the repository root (needs httpx):
+    PYTHONPATH=. python benchmarks/login_storm_benchmark.py
+    PYTHONPATH=. python benchmarks/login_storm_benchmark.py --inline   # bcrypt on the event loop, as before
+
+--inline swaps in the old behaviour (bcrypt verified directly inside the async route) to
+give a baseline for comparison.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "login_storm.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx
+
+from app import crud, schemas
+from app import auth
+from app.create_tables import create_db_and_tables
+from app.database import SessionLocal
+from app.main import app
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def inline_authenticate(db, email, password):
+    """Pre-offload behaviour: lookup and bcrypt both run on the event loop."""
+    user = crud.get_user_by_email(db, email=email)
+    if not user or not auth.pwd_context.verify(password, user.hashed_password):
+        return None
+    return user
+
+async def login_worker(client, stop, counter):
+    while not stop.is_set():
+        response = await client.post("/token", data={"username": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+        counter[0] += 1
+
+async def probe(client, stop, interval, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/test")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+async def run(concurrency, duration, interval):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, logins in (("idle", 0), ("login storm", concurrency)):
+            stop = asyncio.Event()
+            latencies, counter = [], [0]
+            tasks = [asyncio.create_task(probe(client, stop, interval, latencies))]
+            tasks += [asyncio.create_task(login_worker(client, stop, counter)) for _ in range(logins)]
+            await asyncio.sleep(duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+
+            print(
+                f"{label:>12}: probes={len(latencies):>5} p50={statistics.median(latencies):8.2f}ms "
+                f"p99={percentile(latencies, 99):8.2f}ms max={max(latencies):8.2f}ms "
+                f"logins/s={counter[0] / duration:7.1f}"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent login clients (keep below the DB pool size)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per phase")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between probe requests")
+    parser.add_argument("--inline", action="store_true", help="verify bcrypt on the event loop (old behaviour)")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    db = SessionLocal()
+    crud.create_user(db, schemas.UserCreate(email=EMAIL, password=PASSWORD))
+    db.close()
+
+    if args.inline:
+        auth.authenticate_user_async = inline_authenticate
+
+    print(f"hash workers={auth.PASSWORD_HASH_WORKERS} inline={args.inline} concurrency={args.concurrency}")
+    asyncio.run(run(args.concurrency, args.duration, args.interval))
+
+if __name__ == "__main__":
+    main()
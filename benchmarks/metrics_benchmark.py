@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: per-thread sharded metrics vs. a single lock per metric, with several
+threads updating the same Counter and Histogram at once (as a threadpool of sync routes
+does). Also checks that no update is lost and times one /metrics render.
+
+Run from the repository root:
+    PYTHONPATH=. python benchmarks/metrics_benchmark.py
+    PYTHONPATH=. python benchmarks/metrics_benchmark.py --threads 1 8 32 --updates 200000
+"""
+import argparse
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from app import metrics
+
+class LockedCounter:
+    """The Counter this module had before sharding: one lock taken on every inc()."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class LockedHistogram:
+    def __init__(self, buckets=metrics.DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+def run(counter, histogram, threads, updates):
+    """Returns the seconds threads x updates counter + histogram updates took."""
+    def work():
+        for i in range(updates):
+            counter.inc()
+            histogram.observe((i % 100) / 1000)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--updates", type=int, default=100000, help="per thread")
+    args = parser.parse_args()
+
+    ok = True
+    for threads in args.threads:
+        locked = run(LockedCounter(), LockedHistogram(), threads, args.updates)
+        counter, histogram = metrics.Counter(), metrics.Histogram()
+        sharded = run(counter, histogram, threads, args.updates)
+        expected = threads * args.updates
+        ok &= counter.value == expected == histogram.snapshot()["count"]
+        print(f"threads={threads:>3} locked={locked:.3f}s sharded={sharded:.3f}s "
+              f"({expected / sharded:,.0f} updates/s)")
+
+    registry = metrics.Registry()
+    family = registry.histogram("bench_seconds", "benchmark", labelnames=("route",))
+    for route in range(100):
+        family.labels(f"/route/{route}").observe(0.01)
+    start = time.perf_counter()
+    registry.render()
+    print(f"render of 100 labelled histograms: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print("ok" if ok else "FAIL: updates were lost")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
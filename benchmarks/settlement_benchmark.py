@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: heap-based settlement engine vs. the old pop(0)+sort loop.
+
+Run from the repository root:
+    PYTHONPATH=. python benchmarks/settlement_benchmark.py
+    PYTHONPATH=. python benchmarks/settlement_benchmark.py --sizes 10 1000 100000 --legacy-limit 100000
+
+The legacy loop is quadratic, so by default it is skipped above --legacy-limit members.
+"""
+import argparse
+import random
+import time
+
+from app import settlement
+
+def legacy_settle(net_balances):
+    """The settlement loop crud.simplify_balances used before the engine (float amounts)."""
+    debtors = []
+    creditors = []
+    for user_id, balance in net_balances.items():
+        if abs(balance) <= 0.01:
+            continue
+        if balance < 0:
+            debtors.append((balance, user_id))
+        else:
+            creditors.append((-balance, user_id))
+
+    debtors.sort()
+    creditors.sort()
+
+    transfers = []
+    while debtors and creditors:
+        debt_amount_neg, debtor_id = debtors.pop(0)
+        credit_amount_neg, creditor_id = creditors.pop(0)
+
+        debt_abs = abs(debt_amount_neg)
+        credit_abs = abs(credit_amount_neg)
+        settlement_amount = round(min(debt_abs, credit_abs), 2)
+        if settlement_amount > 0:
+            transfers.append((debtor_id, creditor_id, settlement_amount))
+
+        remaining_debt = round(debt_abs - settlement_amount, 2)
+        remaining_credit = round(credit_abs - settlement_amount, 2)
+        if remaining_debt > 0.01:
+            debtors.append((-remaining_debt, debtor_id))
+        if remaining_credit > 0.01:
+            creditors.append((-remaining_credit, creditor_id))
+
+        debtors.sort()
+        creditors.sort()
+    return transfers
+
+def make_balances(members, seed=0):
+    """Random zero-sum balances in cents."""
+    rng = random.Random(seed)
+    balances = {user_id: rng.randint(-50_000, 50_000) for user_id in range(1, members)}
+    balances[members] = -sum(balances.values())
+    return balances
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--legacy-limit", type=int, default=20_000, help="skip the legacy loop above this size")
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'legacy s':>10} {'heap s':>10} {'heap-min s':>11} {'transfers':>10} {'min transfers':>14}")
+    for members in args.sizes:
+        cents = make_balances(members)
+
+        legacy_time = None
+        if members <= args.legacy_limit:
+            legacy_time, _ = timed(legacy_settle, {user_id: amount / 100 for user_id, amount in cents.items()})
+
+        heap_time, transfers = timed(settlement.settle, cents, tolerance_cents=1)
+        minimized_time, minimized = timed(settlement.settle, cents, minimize_transactions=True, tolerance_cents=1)
+
+        legacy_column = f"{legacy_time:10.4f}" if legacy_time is not None else f"{'skipped':>10}"
+        print(f"{members:>8} {legacy_column} {heap_time:10.4f} {minimized_time:11.4f} {len(transfers):>10} {len(minimized):>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool, text
+
+from app.database import SQLALCHEMY_DATABASE_URL
+from app.models import Base
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+# Same URL as the app; '%' must be escaped for configparser
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
+
+target_metadata = Base.metadata
+
+# DDL waits behind long-running queries for its lock, and every query arriving after it
+# queues behind the DDL. Failing fast and retrying beats stalling live traffic.
+MIGRATION_LOCK_TIMEOUT = os.environ.get("MIGRATION_LOCK_TIMEOUT", "5s")
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Leaves the audit_trail partitions (migration 0005), and indexes declared for another
+    dialect with Index.ddl_if(dialect=...), out of autogenerate comparisons.
+    """
+    if type_ == "table" and reflected and compare_to is None and name.startswith("audit_trail_"):
+        return False
+    ddl_if = getattr(object, "_ddl_if", None)
+    if type_ == "index" and not reflected and ddl_if is not None and ddl_if.dialect not in (None, context.get_context().dialect.name):
+        return False
+    return True
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL to stdout instead of running it (alembic upgrade --sql)."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT set_config('lock_timeout', :timeout, false)"), {"timeout": MIGRATION_LOCK_TIMEOUT})
+            connection.commit()
+
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # One transaction per revision, so an autocommit_block (CONCURRENTLY, batched
+            # backfills) inside one revision never commits half of another
+            transaction_per_migration=True,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
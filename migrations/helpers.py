@@ -0,0 +1,104 @@
+"""
+Building blocks for online migrations: changes that must not hold long locks on tables
+the app is serving from.
+"""
+import os
+
+from alembic import op
+from sqlalchemy import text
+
+BACKFILL_BATCH_SIZE = int(os.environ.get("MIGRATION_BACKFILL_BATCH_SIZE", "5000"))
+
+def create_index_concurrently(name, table, columns, **kw):
+    """
+    Builds an index without blocking writes: CREATE INDEX CONCURRENTLY on PostgreSQL,
+    a plain CREATE INDEX elsewhere. Safe to re-run; an INVALID index left behind by an
+    interrupted concurrent build is dropped and rebuilt.
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        if bind.dialect.name == "postgresql" and not op.get_context().as_sql:
+            invalid = bind.execute(text(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw)
+
+def create_partitioned_index_concurrently(name, table, columns, **kw):
+    """
+    create_index_concurrently for a table that may be partitioned on PostgreSQL, where the
+    parent's index cannot be built concurrently: it is created ON ONLY the parent (invalid,
+    nothing built), each partition's index is built concurrently and attached, and the
+    parent's turns valid with the last one. Partitions created later get it automatically.
+    Safe to re-run. Offline, where the partitions are unknown, a plain CREATE INDEX is emitted.
+    """
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return create_index_concurrently(name, table, columns, **kw)
+    if op.get_context().as_sql:
+        op.create_index(name, table, columns, if_not_exists=True, **kw)
+        return
+    partitions = [row[0] for row in bind.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table})]
+    if not partitions:
+        return create_index_concurrently(name, table, columns, **kw)
+
+    ops = kw.get("postgresql_ops", {})
+    column_list = ", ".join(f'"{column}" {ops.get(column, "")}'.rstrip() for column in columns)
+    unique = "UNIQUE " if kw.get("unique") else ""
+    op.execute(
+        f"CREATE {unique}INDEX IF NOT EXISTS {name} ON ONLY {table} "
+        f"USING {kw.get('postgresql_using', 'btree')} ({column_list})"
+    )
+    for partition in partitions:
+        # e.g. ix_audit_trail_new_value_p202612 for partition audit_trail_p202612
+        suffix = partition[len(table) + 1:] if partition.startswith(f"{table}_") else partition
+        partition_index = f"{name}_{suffix}"
+        create_index_concurrently(partition_index, partition, columns, **kw)
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}") # no-op if already attached
+
+def drop_index_concurrently(name, table):
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+def run_in_batches(table, sql, batch_size=None, key="id"):
+    """
+    Runs a DML statement once per range of <table>.<key>, each range committed on its own,
+    so locks are held for one batch only and an interrupted run can simply be restarted.
+    sql must restrict itself to rows with :low <= key < :high and skip rows it already
+    handled. Returns the rows affected.
+    """
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+
+    if op.get_context().as_sql:
+        # Offline mode cannot look at the data; emit a single statement over every key
+        op.execute(text(sql).bindparams(low=-2**63, high=2**63 - 1))
+        return 0
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).first()
+        if low is None:
+            return 0
+
+        affected = 0
+        for start in range(low, high + 1, batch_size):
+            affected += bind.execute(text(sql), {"low": start, "high": start + batch_size}).rowcount
+        return affected
+
+def backfill_in_batches(table, set_sql, pending_sql, batch_size=None, key="id"):
+    """
+    Runs UPDATE <table> SET <set_sql> WHERE <pending_sql> in committed key ranges (see
+    run_in_batches). pending_sql must exclude rows already backfilled (e.g.
+    "amount_cents IS NULL") for re-runs to skip them. Returns the rows updated.
+    """
+    return run_in_batches(
+        table,
+        f"UPDATE {table} SET {set_sql} WHERE {key} >= :low AND {key} < :high AND ({pending_sql})",
+        batch_size=batch_size,
+        key=key,
+    )
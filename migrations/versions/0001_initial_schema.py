@@ -0,0 +1,130 @@
+"""initial schema
+
+The tables as create_tables.create_db_and_tables built them before migrations existed.
+Databases created that way are brought under migration control with:
+    alembic stamp 0001
+    alembic upgrade head
+Databases created before the member_balances ledger have no such table; 0002 creates it
+empty, and python -m app.rebuild_balances (crud.rebuild_group_ledger per group) then
+fills it from their expenses.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 18:08:22.243560
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'])
+
+    op.create_table('groups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('admin_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['admin_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_groups_id', 'groups', ['id'])
+    op.create_index('ix_groups_name', 'groups', ['name'])
+
+    op.create_table('expenses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('payer_id', sa.Integer(), nullable=True),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('creator_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['creator_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['payer_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_expenses_id', 'expenses', ['id'])
+
+    op.create_table('group_members',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.Column('remark', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+
+    op.create_table('member_balances',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('net_balance', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+
+    op.create_table('recurring_expenses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('frequency', sa.Enum('daily', 'weekly', 'monthly', 'yearly', name='recurringfrequency'), nullable=True),
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('end_date', sa.Date(), nullable=True),
+        sa.Column('payer_id', sa.Integer(), nullable=True),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['payer_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_recurring_expenses_id', 'recurring_expenses', ['id'])
+
+    op.create_table('audit_trail',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('expense_id', sa.Integer(), nullable=True),
+        sa.Column('recurring_expense_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(), nullable=True),
+        sa.Column('old_value', sa.String(), nullable=True),
+        sa.Column('new_value', sa.String(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['recurring_expense_id'], ['recurring_expenses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_trail_id', 'audit_trail', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('audit_trail')
+    op.drop_table('recurring_expenses')
+    op.drop_table('member_balances')
+    op.drop_table('group_members')
+    op.drop_table('expenses')
+    op.drop_table('groups')
+    op.drop_table('users')
+    sa.Enum(name='recurringfrequency').drop(op.get_bind(), checkfirst=True)
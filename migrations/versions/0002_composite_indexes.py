@@ -0,0 +1,51 @@
+"""composite indexes for the hot query paths
+
+Built with CREATE INDEX CONCURRENTLY on PostgreSQL, so writes keep flowing while the
+indexes build.
+
+Also creates member_balances when it is missing: a database made by create_tables before
+the balance ledger existed and stamped 0001 has none. Fill it afterwards with
+python -m app.rebuild_balances.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 18:20:03.512114
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Offline (--sql) output has no database to inspect and assumes the table exists
+    if not context.is_offline_mode() and not sa.inspect(op.get_bind()).has_table('member_balances'):
+        op.create_table('member_balances',
+            sa.Column('group_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('net_balance', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('group_id', 'user_id')
+        )
+    create_index_concurrently('ix_group_members_user_group', 'group_members', ['user_id', 'group_id'])
+    create_index_concurrently('ix_expenses_group_payer', 'expenses', ['group_id', 'payer_id'], postgresql_include=['amount'])
+    create_index_concurrently('ix_audit_trail_group_timestamp', 'audit_trail', ['group_id', 'timestamp', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_audit_trail_group_timestamp', 'audit_trail')
+    drop_index_concurrently('ix_expenses_group_payer', 'expenses')
+    drop_index_concurrently('ix_group_members_user_group', 'group_members')
@@ -0,0 +1,68 @@
+"""store amounts as integer cents
+
+Replaces the Float amount columns with BigInteger cents. Each value goes through its
+shortest decimal form (float -> NUMERIC) before scaling, so 10.1 becomes 1010 and not
+1009 or 1010.0000000001. The copy runs in committed batches.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 18:41:52.094113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, float column, cents column, batch key)
+AMOUNT_COLUMNS = (
+    ('expenses', 'amount', 'amount_cents', 'id'),
+    ('recurring_expenses', 'amount', 'amount_cents', 'id'),
+    ('member_balances', 'net_balance', 'net_balance_cents', 'group_id'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, old, new, key in AMOUNT_COLUMNS:
+        op.add_column(table, sa.Column(new, sa.BigInteger(), nullable=True))
+        backfill_in_batches(
+            table,
+            f"{new} = CAST(ROUND(CAST(COALESCE({old}, 0) AS NUMERIC) * 100) AS BIGINT)",
+            f"{new} IS NULL",
+            key=key,
+        )
+
+    # The covering index carried the old column
+    drop_index_concurrently('ix_expenses_group_payer', 'expenses')
+    create_index_concurrently('ix_expenses_group_payer', 'expenses', ['group_id', 'payer_id'], postgresql_include=['amount_cents'])
+
+    for table, old, new, key in AMOUNT_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(new, existing_type=sa.BigInteger(), nullable=False)
+            batch_op.drop_column(old)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, old, new, key in AMOUNT_COLUMNS:
+        op.add_column(table, sa.Column(old, sa.Float(), nullable=True))
+        backfill_in_batches(table, f"{old} = {new} / 100.0", f"{old} IS NULL", key=key)
+
+    drop_index_concurrently('ix_expenses_group_payer', 'expenses')
+    create_index_concurrently('ix_expenses_group_payer', 'expenses', ['group_id', 'payer_id'], postgresql_include=['amount'])
+
+    for table, old, new, key in AMOUNT_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(new)
+            if table == 'member_balances':
+                batch_op.alter_column(old, existing_type=sa.Float(), nullable=False)
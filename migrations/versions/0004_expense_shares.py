@@ -0,0 +1,71 @@
+"""per-member expense shares
+
+Adds expense_shares and expenses.expense_date. Existing expenses get the shares the
+ledger already assumed: an equal split across the group's current members, leftover
+cents to the lowest user ids (app.money.split_evenly), so balances do not move.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 19:02:37.418260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches, run_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Equal split of every expense over its group's members, ranked by user id
+BACKFILL_SHARES = """
+INSERT INTO expense_shares (expense_id, group_id, member_id, amount_cents)
+SELECT e.id, e.group_id, m.user_id,
+       e.amount_cents / m.member_count + CASE WHEN m.member_rank < e.amount_cents % m.member_count THEN 1 ELSE 0 END
+FROM expenses e
+JOIN (
+    SELECT group_id, user_id,
+           ROW_NUMBER() OVER (PARTITION BY group_id ORDER BY user_id) - 1 AS member_rank,
+           COUNT(*) OVER (PARTITION BY group_id) AS member_count
+    FROM group_members
+) m ON m.group_id = e.group_id
+WHERE e.id >= :low AND e.id < :high
+  AND NOT EXISTS (SELECT 1 FROM expense_shares s WHERE s.expense_id = e.id)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('expense_shares',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('expense_id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.Column('amount_cents', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['member_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('expense_id', 'member_id', name='uq_expense_shares_expense_member')
+    )
+    op.create_index('ix_expense_shares_group_member', 'expense_shares', ['group_id', 'member_id'], postgresql_include=['amount_cents'])
+
+    op.add_column('expenses', sa.Column('expense_date', sa.Date(), nullable=True))
+    to_date = 'DATE("timestamp")' if op.get_bind().dialect.name == 'sqlite' else 'CAST("timestamp" AS DATE)'
+    backfill_in_batches('expenses', f'expense_date = {to_date}', 'expense_date IS NULL AND "timestamp" IS NOT NULL')
+
+    run_in_batches('expenses', BACKFILL_SHARES)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.drop_column('expense_date')
+    op.drop_index('ix_expense_shares_group_member', table_name='expense_shares')
+    op.drop_table('expense_shares')
@@ -0,0 +1,127 @@
+"""monthly range partitions for audit_trail (PostgreSQL)
+
+audit_trail becomes a table partitioned by month on "timestamp". The existing rows are not
+copied: the old table is attached whole as the partition audit_trail_legacy, covering
+everything before the month after next. A CHECK constraint proving that range is added and
+validated online first, along with the (id, timestamp) unique index the new primary key
+needs, so the final swap only touches the catalog. Monthly partitions and a DEFAULT
+partition follow; app/audit_partitions.py keeps creating months ahead and applies the
+retention policy. Other databases keep a plain table; "timestamp" becomes NOT NULL on all.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 19:40:12.604187
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches, create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3 # monthly partitions created past the legacy one
+
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return datetime.date(month.year + year, month_index + 1, 1)
+
+
+def _audit_trail_columns():
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('audit_trail_id_seq'::regclass)"), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('expense_id', sa.Integer(), nullable=True),
+        sa.Column('recurring_expense_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(), nullable=True),
+        sa.Column('old_value', sa.String(), nullable=True),
+        sa.Column('new_value', sa.String(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['expense_id'], ['expenses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['recurring_expense_id'], ['recurring_expenses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    backfill_in_batches('audit_trail', '"timestamp" = CURRENT_TIMESTAMP', '"timestamp" IS NULL')
+
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('audit_trail') as batch_op:
+            batch_op.alter_column('timestamp', existing_type=sa.DateTime(), existing_server_default=sa.func.now(), nullable=False)
+        return
+
+    # Rows written until the swap must fit the legacy range, so leave at least a month of margin
+    boundary = _add_months(datetime.date.today().replace(day=1), 2)
+
+    # Online preparation: each step commits on its own and none blocks writes for long
+    with op.get_context().autocommit_block():
+        op.execute(
+            'ALTER TABLE audit_trail ADD CONSTRAINT audit_trail_legacy_range '
+            f'CHECK ("timestamp" IS NOT NULL AND "timestamp" < \'{boundary}\') NOT VALID'
+        )
+        op.execute('ALTER TABLE audit_trail VALIDATE CONSTRAINT audit_trail_legacy_range')
+    create_index_concurrently('audit_trail_legacy_id_timestamp', 'audit_trail', ['id', 'timestamp'], unique=True)
+
+    # The swap: catalog changes only, in one short transaction
+    op.rename_table('audit_trail', 'audit_trail_legacy')
+    op.execute('ALTER INDEX ix_audit_trail_id RENAME TO ix_audit_trail_legacy_id')
+    op.execute('ALTER INDEX ix_audit_trail_group_timestamp RENAME TO ix_audit_trail_legacy_group_timestamp')
+    op.execute('ALTER TABLE audit_trail_legacy DROP CONSTRAINT audit_trail_pkey')
+    op.execute('ALTER TABLE audit_trail_legacy ADD CONSTRAINT audit_trail_legacy_pkey PRIMARY KEY USING INDEX audit_trail_legacy_id_timestamp')
+    op.execute('ALTER TABLE audit_trail_legacy ALTER COLUMN id DROP DEFAULT')
+
+    op.create_table('audit_trail',
+        *_audit_trail_columns(),
+        # The partition key has to be part of every unique constraint
+        sa.PrimaryKeyConstraint('id', 'timestamp', name='audit_trail_pkey'),
+        postgresql_partition_by='RANGE ("timestamp")'
+    )
+    op.execute('ALTER SEQUENCE audit_trail_id_seq OWNED BY audit_trail.id')
+    op.create_index('ix_audit_trail_id', 'audit_trail', ['id'])
+    op.create_index('ix_audit_trail_group_timestamp', 'audit_trail', ['group_id', 'timestamp', 'id'])
+
+    op.execute(f"ALTER TABLE audit_trail ATTACH PARTITION audit_trail_legacy FOR VALUES FROM (MINVALUE) TO ('{boundary}')")
+    for offset in range(MONTHS_AHEAD):
+        start = _add_months(boundary, offset)
+        op.execute(
+            f"CREATE TABLE audit_trail_p{start:%Y%m} PARTITION OF audit_trail "
+            f"FOR VALUES FROM ('{start}') TO ('{_add_months(start, 1)}')"
+        )
+    op.execute('CREATE TABLE audit_trail_default PARTITION OF audit_trail DEFAULT')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('audit_trail') as batch_op:
+            batch_op.alter_column('timestamp', existing_type=sa.DateTime(), existing_server_default=sa.func.now(), nullable=True)
+        return
+
+    # Back to one plain table; copies every row, so this is not an online operation
+    op.create_table('audit_trail_unpartitioned',
+        *_audit_trail_columns(),
+        sa.PrimaryKeyConstraint('id', name='audit_trail_unpartitioned_pkey'),
+    )
+    columns = ', '.join(f'"{column.name}"' for column in _audit_trail_columns() if isinstance(column, sa.Column))
+    op.execute(f'INSERT INTO audit_trail_unpartitioned ({columns}) SELECT {columns} FROM audit_trail')
+    op.execute('ALTER SEQUENCE audit_trail_id_seq OWNED BY audit_trail_unpartitioned.id')
+    op.drop_table('audit_trail') # and every partition with it
+
+    op.rename_table('audit_trail_unpartitioned', 'audit_trail')
+    op.execute('ALTER INDEX audit_trail_unpartitioned_pkey RENAME TO audit_trail_pkey')
+    op.alter_column('audit_trail', 'timestamp', existing_type=sa.DateTime(), existing_server_default=sa.func.now(), nullable=True)
+    op.create_index('ix_audit_trail_id', 'audit_trail', ['id'])
+    op.create_index('ix_audit_trail_group_timestamp', 'audit_trail', ['group_id', 'timestamp', 'id'])
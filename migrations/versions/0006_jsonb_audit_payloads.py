@@ -0,0 +1,117 @@
+"""JSON audit payloads, with indexes for audit searches
+
+audit_trail.old_value and new_value become JSONB on PostgreSQL (JSON text elsewhere), so
+the audit route can filter on their contents in SQL. Values that are not JSON (free-form
+text from older code) are kept as JSON strings, and the amounts older expense entries
+stored as strings become numbers, as new entries write them.
+
+On PostgreSQL the JSONB columns are added next to the text ones and filled in committed
+batches; the swap (catching up on rows written meanwhile, dropping and renaming columns)
+is a short transaction. The new indexes, GIN (jsonb_path_ops) on both payloads and btree
+for the action and expense filters, are built partition by partition without blocking
+writes.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 20:21:48.301577
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from migrations.helpers import backfill_in_batches, create_partitioned_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PAYLOAD_COLUMNS = ('old_value', 'new_value')
+AMOUNT_KEYS = ('amount', 'total') # written with str(Decimal) before this revision
+
+# name, columns, extra options; the GIN ones exist on PostgreSQL only
+INDEXES = (
+    ('ix_audit_trail_group_action_timestamp', ['group_id', 'action', 'timestamp', 'id'], {}),
+    ('ix_audit_trail_expense_id', ['expense_id'], {}),
+)
+GIN_INDEXES = tuple(
+    (f'ix_audit_trail_{column}', [column], {'postgresql_using': 'gin', 'postgresql_ops': {column: 'jsonb_path_ops'}})
+    for column in PAYLOAD_COLUMNS
+)
+
+
+def _pg_to_jsonb(column):
+    # Older code stored json.dumps() of dicts, or plain text
+    jsonb = f"CASE WHEN {column} ~ '^\\s*[\\[{{]' THEN CAST({column} AS JSONB) ELSE to_jsonb({column}) END"
+    for key in AMOUNT_KEYS:
+        jsonb = (
+            f"(SELECT CASE WHEN jsonb_typeof(v -> '{key}') = 'string' AND v ->> '{key}' ~ '^-?[0-9]+(\\.[0-9]+)?$' "
+            f"THEN jsonb_set(v, '{{{key}}}', to_jsonb(CAST(v ->> '{key}' AS NUMERIC))) ELSE v END "
+            f"FROM (SELECT {jsonb} AS v) AS converted)"
+        )
+    return jsonb
+
+
+def _pg_swap(source_suffix, target_type, convert):
+    """Adds <column><source_suffix> columns of target_type, fills them with convert(column), swaps them in."""
+    bind = op.get_bind()
+    max_id = None if op.get_context().as_sql else bind.execute(sa.text('SELECT MAX(id) FROM audit_trail')).scalar()
+    for column in PAYLOAD_COLUMNS:
+        op.add_column('audit_trail', sa.Column(f'{column}{source_suffix}', target_type, nullable=True))
+    pending = ' OR '.join(f'({column}{source_suffix} IS NULL AND {column} IS NOT NULL)' for column in PAYLOAD_COLUMNS)
+    assignments = ', '.join(f'{column}{source_suffix} = {convert(column)}' for column in PAYLOAD_COLUMNS)
+    backfill_in_batches('audit_trail', assignments, pending)
+
+    # The swap: rows written since the backfill started, then catalog changes only
+    if max_id is not None:
+        op.execute(sa.text(f'UPDATE audit_trail SET {assignments} WHERE id > :max_id AND ({pending})').bindparams(max_id=max_id))
+    for column in PAYLOAD_COLUMNS:
+        op.drop_column('audit_trail', column)
+        op.alter_column('audit_trail', f'{column}{source_suffix}', new_column_name=column)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        _pg_swap('_jsonb', postgresql.JSONB(), _pg_to_jsonb)
+    else:
+        for column in PAYLOAD_COLUMNS:
+            backfill_in_batches('audit_trail', f'{column} = json_quote({column})', f'{column} IS NOT NULL AND NOT json_valid({column})')
+            for key in AMOUNT_KEYS:
+                backfill_in_batches(
+                    'audit_trail',
+                    f"{column} = json_set({column}, '$.{key}', CAST(json_extract({column}, '$.{key}') AS REAL))",
+                    f"json_type({column}, '$.{key}') = 'text' AND json_extract({column}, '$.{key}') <> '' "
+                    f"AND NOT json_extract({column}, '$.{key}') GLOB '*[^0-9.-]*'",
+                )
+        with op.batch_alter_table('audit_trail') as batch_op:
+            for column in PAYLOAD_COLUMNS:
+                batch_op.alter_column(column, existing_type=sa.String(), type_=sa.JSON(), existing_nullable=True)
+
+    for name, columns, options in INDEXES:
+        create_partitioned_index_concurrently(name, 'audit_trail', columns, **options)
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, columns, options in GIN_INDEXES:
+            create_partitioned_index_concurrently(name, 'audit_trail', columns, **options)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+    for name, _, _ in INDEXES + (GIN_INDEXES if is_postgresql else ()):
+        op.drop_index(name, table_name='audit_trail', if_exists=True)
+
+    if is_postgresql:
+        # JSON strings go back to the plain text they were; everything else to its JSON text
+        _pg_swap('_text', sa.String(), lambda column: f"CASE WHEN jsonb_typeof({column}) = 'string' THEN {column} #>> '{{}}' ELSE CAST({column} AS TEXT) END")
+    else:
+        for column in PAYLOAD_COLUMNS:
+            backfill_in_batches('audit_trail', f"{column} = json_extract({column}, '$')", f"json_type({column}) = 'text'")
+        with op.batch_alter_table('audit_trail') as batch_op:
+            for column in PAYLOAD_COLUMNS:
+                batch_op.alter_column(column, existing_type=sa.JSON(), type_=sa.String(), existing_nullable=True)
@@ -0,0 +1,70 @@
+"""recurring expense scheduling
+
+Adds the recurring_expenses columns the app already writes (creator_id,
+split_details_json) and next_due_date, the scheduler's queue position, indexed and
+backfilled from start_date. Expenses get recurring_expense_id and occurrence_date, unique
+together, so an occurrence can only ever be booked once.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 21:02:15.884190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches, create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('recurring_expenses') as batch_op:
+        batch_op.add_column(sa.Column('creator_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('split_details_json', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('next_due_date', sa.Date(), nullable=True))
+        batch_op.create_foreign_key('recurring_expenses_creator_id_fkey', 'users', ['creator_id'], ['id'])
+    backfill_in_batches('recurring_expenses', 'next_due_date = start_date', 'next_due_date IS NULL')
+    create_index_concurrently('ix_recurring_expenses_next_due_date', 'recurring_expenses', ['next_due_date'])
+
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.add_column(sa.Column('recurring_expense_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('occurrence_date', sa.Date(), nullable=True))
+        # NOT VALID on PostgreSQL: no scan of expenses while the lock is held; validated below
+        batch_op.create_foreign_key(
+            'expenses_recurring_expense_id_fkey', 'recurring_expenses', ['recurring_expense_id'], ['id'],
+            ondelete='SET NULL', postgresql_not_valid=True
+        )
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute('ALTER TABLE expenses VALIDATE CONSTRAINT expenses_recurring_expense_id_fkey')
+        # Build the index without blocking writes, then promote it to the constraint
+        create_index_concurrently('uq_expenses_recurring_occurrence', 'expenses', ['recurring_expense_id', 'occurrence_date'], unique=True)
+        op.execute('ALTER TABLE expenses ADD CONSTRAINT uq_expenses_recurring_occurrence UNIQUE USING INDEX uq_expenses_recurring_occurrence')
+    else:
+        with op.batch_alter_table('expenses') as batch_op:
+            batch_op.create_unique_constraint('uq_expenses_recurring_occurrence', ['recurring_expense_id', 'occurrence_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.drop_constraint('uq_expenses_recurring_occurrence', type_='unique')
+        batch_op.drop_constraint('expenses_recurring_expense_id_fkey', type_='foreignkey')
+        batch_op.drop_column('occurrence_date')
+        batch_op.drop_column('recurring_expense_id')
+
+    op.drop_index('ix_recurring_expenses_next_due_date', table_name='recurring_expenses')
+    with op.batch_alter_table('recurring_expenses') as batch_op:
+        batch_op.drop_constraint('recurring_expenses_creator_id_fkey', type_='foreignkey')
+        batch_op.drop_column('next_due_date')
+        batch_op.drop_column('split_details_json')
+        batch_op.drop_column('creator_id')
@@ -0,0 +1,48 @@
+"""partial due-queue index for recurring expenses
+
+next_due_date becomes NULL once a schedule is past its end_date, and the due queue is a
+partial index over (next_due_date, id) of the schedules that still have one. Finding
+what is due is then a range scan over due rows only, however many schedules exist or
+have ended. The new index is built before the old one is dropped. Also indexes
+recurring_expenses.group_id, which listing a group's schedules scanned the table for.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 21:37:06.512944
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.text('next_due_date IS NOT NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    backfill_in_batches('recurring_expenses', 'next_due_date = NULL', 'end_date IS NOT NULL AND next_due_date > end_date')
+    create_index_concurrently(
+        'ix_recurring_expenses_due', 'recurring_expenses', ['next_due_date', 'id'], postgresql_where=ACTIVE, sqlite_where=ACTIVE
+    )
+    drop_index_concurrently('ix_recurring_expenses_next_due_date', 'recurring_expenses')
+    create_index_concurrently('ix_recurring_expenses_group_id', 'recurring_expenses', ['group_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_recurring_expenses_group_id', 'recurring_expenses')
+    create_index_concurrently('ix_recurring_expenses_next_due_date', 'recurring_expenses', ['next_due_date'])
+    drop_index_concurrently('ix_recurring_expenses_due', 'recurring_expenses')
+    # Exhausted schedules parked past their end, where the 0007 scheduler skips them
+    backfill_in_batches('recurring_expenses', 'next_due_date = end_date + 1' if op.get_bind().dialect.name == 'postgresql'
+                        else "next_due_date = DATE(end_date, '+1 day')", 'next_due_date IS NULL AND end_date IS NOT NULL')
@@ -0,0 +1,88 @@
+"""recurring expense members in their own table
+
+The split of a recurring expense moves out of the split_details_json text column: the
+split type becomes recurring_expenses.split_type, and the members one row each in
+recurring_expense_members, indexed by member. Removing a member from a group, or listing
+the schedules a member shares, then looks the member up instead of parsing every
+schedule's JSON. Both are filled in committed batches, which skip schedules already
+copied, before split_details_json is dropped.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 22:10:43.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches, run_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+    op.create_table(
+        'recurring_expense_members',
+        sa.Column('recurring_expense_id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['recurring_expense_id'], ['recurring_expenses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['member_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('recurring_expense_id', 'member_id'),
+    )
+    op.create_index('ix_recurring_expense_members_member', 'recurring_expense_members', ['member_id', 'recurring_expense_id'])
+
+    with op.batch_alter_table('recurring_expenses') as batch_op:
+        batch_op.add_column(sa.Column('split_type', sa.String(), nullable=True))
+    backfill_in_batches(
+        'recurring_expenses',
+        "split_type = COALESCE(CAST(split_details_json AS JSON) ->> 'split_type', 'equal')" if is_postgresql
+        else "split_type = COALESCE(json_extract(split_details_json, '$.split_type'), 'equal')",
+        'split_type IS NULL',
+    )
+    member_ids = (
+        "json_array_elements_text(CAST(r.split_details_json AS JSON) -> 'member_ids') AS m(value)" if is_postgresql
+        else "json_each(r.split_details_json, '$.member_ids') AS m"
+    )
+    run_in_batches(
+        'recurring_expenses',
+        "INSERT INTO recurring_expense_members (recurring_expense_id, member_id) "
+        f"SELECT DISTINCT r.id, CAST(m.value AS INTEGER) FROM recurring_expenses AS r, {member_ids} "
+        "WHERE r.id >= :low AND r.id < :high AND NOT EXISTS "
+        "(SELECT 1 FROM recurring_expense_members AS e WHERE e.recurring_expense_id = r.id)",
+    )
+    with op.batch_alter_table('recurring_expenses') as batch_op:
+        batch_op.alter_column('split_type', existing_type=sa.String(), nullable=False)
+        batch_op.drop_column('split_details_json')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+    with op.batch_alter_table('recurring_expenses') as batch_op:
+        batch_op.add_column(sa.Column('split_details_json', sa.String(), nullable=True))
+    members = (
+        "SELECT json_agg(e.member_id ORDER BY e.member_id) FROM recurring_expense_members AS e "
+        "WHERE e.recurring_expense_id = recurring_expenses.id" if is_postgresql
+        else "SELECT json_group_array(e.member_id) FROM (SELECT member_id FROM recurring_expense_members "
+        "WHERE recurring_expense_id = recurring_expenses.id ORDER BY member_id) AS e"
+    )
+    backfill_in_batches(
+        'recurring_expenses',
+        f"split_details_json = CAST(json_build_object('split_type', split_type, 'member_ids', COALESCE(({members}), '[]')) AS TEXT)"
+        if is_postgresql else
+        f"split_details_json = json_object('split_type', split_type, 'member_ids', json(({members})))",
+        'split_details_json IS NULL',
+    )
+    with op.batch_alter_table('recurring_expenses') as batch_op:
+        batch_op.drop_column('split_type')
+    op.drop_index('ix_recurring_expense_members_member', table_name='recurring_expense_members')
+    op.drop_table('recurring_expense_members')
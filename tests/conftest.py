@@ -0,0 +1,26 @@
+"""
+The app reads its configuration when imported, so the environment is set here, before
+any test module imports it. Tests run against a throwaway SQLite database unless
+TEST_DATABASE_URL names another (empty, scratch) one. The async stack is on, so its
+routes are served ahead of the sync ones and both can be compared.
+"""
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+os.environ.setdefault("BCRYPT_ROUNDS", "4") # the cost does not matter here, only the wait
+os.environ["USE_ASYNC_DB"] = "true"
+
+from app.create_tables import create_db_and_tables
+from app.database import engine
+from app.models import Base
+
+@pytest.fixture(scope="module")
+def fresh_db():
+    """An empty, fully migrated schema for each test module; modules seed what they need."""
+    Base.metadata.drop_all(bind=engine)
+    create_db_and_tables()
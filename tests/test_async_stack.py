@@ -0,0 +1,78 @@
+"""The async routes (USE_ASYNC_DB, aiosqlite on SQLite) answer like their sync counterparts."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import async_routes, database, main
+
+def sync_stack_app() -> FastAPI:
+    """main's own routes without the async variants registered ahead of them."""
+    app = FastAPI()
+    app.router.routes.extend(
+        route for route in main.app.routes if getattr(route, "endpoint", None) is not None
+        and route.endpoint.__module__ == main.__name__
+    )
+    return app
+
+def async_checkouts() -> int:
+    """Grows only when a request is served by an async route."""
+    return database.async_pool_metrics.checkouts.value
+
+@pytest.fixture(scope="module")
+def clients(fresh_db):
+    # One client for the module: pooled aiosqlite connections belong to its event loop
+    with TestClient(main.app) as async_client:
+        yield async_client, TestClient(sync_stack_app())
+        async_client.portal.call(database.async_engine.dispose)
+
+@pytest.fixture(scope="module")
+def headers(clients):
+    async_client, _ = clients
+    for email in ("payer@example.com", "member@example.com"):
+        async_client.post("/users/signup", json={"email": email, "password": "pw"})
+    token = async_client.post("/token", data={"username": "payer@example.com", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    group_id = async_client.post("/groups/", json={"name": "flat"}, headers=headers).json()["id"]
+    async_client.post(f"/groups/{group_id}/members", params={"user_id": 2}, headers=headers)
+    return headers
+
+def test_async_engine_is_aiosqlite_on_sqlite():
+    assert database.async_engine is not None
+    if database.engine.dialect.name == "sqlite":
+        assert database.async_engine.url.drivername == "sqlite+aiosqlite"
+
+def test_me(clients, headers):
+    async_client, sync_client = clients
+    checkouts = async_checkouts()
+    response = async_client.get("/me", headers=headers)
+    assert response.status_code == 200
+    assert async_checkouts() > checkouts
+    assert response.json() == sync_client.get("/me", headers=headers).json()
+
+def test_create_expense(clients, headers):
+    async_client, sync_client = clients
+    expense = {"description": "groceries", "amount": 30, "expense_date": "2025-01-01", "group_id": 1,
+               "payer_id": 1, "shares": [{"member_id": 1, "amount": 10}, {"member_id": 2, "amount": 20}]}
+    checkouts = async_checkouts()
+    from_async = async_client.post("/expenses/", json=expense, headers=headers)
+    assert async_checkouts() > checkouts
+    from_sync = sync_client.post("/expenses/", json=expense, headers=headers)
+    assert from_async.status_code == from_sync.status_code == 201
+    ignored = ("id", "timestamp")
+    assert {k: v for k, v in from_async.json().items() if k not in ignored} == \
+           {k: v for k, v in from_sync.json().items() if k not in ignored}
+
+    bad_group = {**expense, "group_id": 999}
+    assert async_client.post("/expenses/", json=bad_group, headers=headers).status_code == \
+           sync_client.post("/expenses/", json=bad_group, headers=headers).status_code == 404
+
+@pytest.mark.parametrize("minimize_transactions", [False, True])
+def test_group_balances(clients, headers, minimize_transactions):
+    async_client, sync_client = clients
+    params = {"minimize_transactions": minimize_transactions}
+    checkouts = async_checkouts()
+    from_async = async_client.get("/groups/1/balances", params=params, headers=headers)
+    assert from_async.status_code == 200
+    assert async_checkouts() > checkouts
+    assert from_async.json() == sync_client.get("/groups/1/balances", params=params, headers=headers).json()
+    assert from_async.json()["balances"] == [{"payer_id": 2, "payee_id": 1, "amount": 40.0}]
@@ -0,0 +1,123 @@
+"""
+EXPLAIN checks: the hot crud queries reach expenses, expense_shares, group_members,
+audit_trail, recurring_expenses and recurring_expense_members through an index, never a
+full table scan.
+
+Each case runs one crud function on a seeded dataset while capturing the SQL it emits,
+then EXPLAINs every captured statement with its real parameters. On PostgreSQL
+(TEST_DATABASE_URL) sequential scans are disabled for the session, so the planner's choice
+on a small dataset does not hide a missing index.
+"""
+import datetime
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import crud, models
+from app.database import SessionLocal, engine
+
+WATCHED_TABLES = {"expenses", "expense_shares", "group_members", "audit_trail", "recurring_expenses", "recurring_expense_members"}
+USERS, GROUPS, EXPENSES_PER_GROUP, AUDIT_PER_GROUP, SCHEDULES_PER_GROUP = 200, 50, 40, 40, 20
+
+def seed(db):
+    db.execute(insert(models.User), [
+        {"id": i, "email": f"explain{i}@example.com", "hashed_password": "x"} for i in range(1, USERS + 1)
+    ])
+    db.execute(insert(models.Group), [{"id": g, "name": f"group {g}", "admin_id": g} for g in range(1, GROUPS + 1)])
+    db.execute(insert(models.GroupMember), [
+        {"group_id": g, "user_id": (g + k) % USERS + 1, "is_admin": k == 0} for g in range(1, GROUPS + 1) for k in range(8)
+    ])
+    db.execute(insert(models.Expense), [
+        {"group_id": g, "payer_id": (g + k % 8) % USERS + 1, "creator_id": g, "description": "x", "amount_cents": 1250}
+        for g in range(1, GROUPS + 1) for k in range(EXPENSES_PER_GROUP)
+    ])
+    db.execute(insert(models.ExpenseShare), [
+        {"expense_id": expense_id, "group_id": (expense_id - 1) // EXPENSES_PER_GROUP + 1,
+         "member_id": ((expense_id - 1) // EXPENSES_PER_GROUP + 1 + k) % USERS + 1, "amount_cents": 625}
+        for expense_id in range(1, GROUPS * EXPENSES_PER_GROUP + 1) for k in range(2)
+    ])
+    start = datetime.datetime(2025, 1, 1)
+    db.execute(insert(models.AuditTrail), [
+        {"group_id": g, "user_id": g, "action": "created", "timestamp": start + datetime.timedelta(minutes=k)}
+        for g in range(1, GROUPS + 1) for k in range(AUDIT_PER_GROUP)
+    ])
+    # Mostly not yet due or ended (no next_due_date), as in a long-lived system
+    db.execute(insert(models.RecurringExpense), [
+        {"group_id": g, "payer_id": g, "creator_id": g, "description": "x", "amount_cents": 500,
+         "frequency": models.RecurringFrequency.monthly, "start_date": datetime.date(2024, 1, 1 + k),
+         "next_due_date": None if k % 2 else datetime.date(2025, 1 + k % 12, 1 + k)}
+        for g in range(1, GROUPS + 1) for k in range(SCHEDULES_PER_GROUP)
+    ])
+    db.execute(insert(models.RecurringExpenseMember), [
+        {"recurring_expense_id": (g - 1) * SCHEDULES_PER_GROUP + k + 1, "member_id": (g + m) % USERS + 1}
+        for g in range(1, GROUPS + 1) for k in range(SCHEDULES_PER_GROUP) for m in range(3)
+    ])
+    db.commit()
+
+CHECKS = {
+    "get_user_groups": lambda db: crud.get_user_groups(db, user_id=7),
+    "get_group_detail": lambda db: crud.get_group_detail(db, group_id=7),
+    "get_group_member_totals": lambda db: crud.get_group_member_totals(db, group_id=7),
+    "get_audit_trail_for_group": lambda db: crud.get_audit_trail_for_group(db, group_id=7, limit=10),
+    "get_audit_trail_for_group (cursor)": lambda db: crud.get_audit_trail_for_group(
+        db, group_id=7, limit=10, before=(datetime.datetime(2025, 1, 1, 0, 20), 10**9)
+    ),
+    "materialize_due_recurring_expenses": lambda db: crud.materialize_due_recurring_expenses(
+        db, today=datetime.date(2025, 1, 31), batch_size=10
+    ),
+    "get_recurring_expenses_for_group (member)": lambda db: crud.get_recurring_expenses_for_group(db, group_id=7, member_id=9),
+    "remove_group_member": lambda db: crud.remove_group_member(db, group_id=7, user_id=9),
+}
+
+def capture(fn):
+    """Runs fn against a fresh session and returns the (statement, parameters) it executed."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+    return statements
+
+def sequential_scans(conn, statement, parameters):
+    """Returns the watched tables the plan reads without an index, plus the raw plan."""
+    if engine.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        scans, stack = set(), [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in WATCHED_TABLES:
+                scans.add(node["Relation Name"])
+            stack.extend(node.get("Plans", []))
+        return scans, plan
+
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    details = [row[-1] for row in rows]
+    # "SCAN t" is a full scan; "SCAN t USING [COVERING] INDEX ..." walks an index in order
+    scans = {d.split()[1] for d in details if d.startswith("SCAN ") and "USING" not in d and d.split()[1] in WATCHED_TABLES}
+    return scans, details
+
+@pytest.fixture(scope="module")
+def explain_conn(fresh_db):
+    db = SessionLocal()
+    seed(db)
+    db.close()
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE")
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        yield conn
+
+@pytest.mark.parametrize("name", CHECKS)
+def test_crud_query_uses_indexes(explain_conn, name):
+    statements = capture(CHECKS[name])
+    assert statements
+    for statement, parameters in statements:
+        scans, plan = sequential_scans(explain_conn, statement, parameters)
+        assert not scans, f"sequential scan of {', '.join(sorted(scans))}\n  {statement}\n  {plan}"
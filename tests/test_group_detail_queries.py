@@ -0,0 +1,63 @@
+"""GET /groups/{group_id} loads a group in a fixed number of queries, whatever its size."""
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, models, schemas
+from app.database import SessionLocal, engine
+
+SIZES = (1, 10, 100)
+MAX_QUERIES = 6 # the group, plus one SELECT per eager-loaded collection
+
+def seed_group(db, size):
+    """Creates a group with `size` members, `size` expenses with shares and a few recurring expenses."""
+    users = [models.User(email=f"g{size}-{i}@example.com", hashed_password="x") for i in range(size)]
+    db.add_all(users)
+    db.flush()
+
+    group = models.Group(name=f"group of {size}", admin_id=users[0].id)
+    db.add(group)
+    db.flush()
+
+    db.add_all(models.GroupMember(group_id=group.id, user_id=user.id, is_admin=user is users[0]) for user in users)
+    db.add_all(
+        models.Expense(description=f"expense {i}", amount=10.0, expense_date=datetime.date(2025, 1, 1),
+                       group_id=group.id, payer_id=users[i].id, creator_id=users[i].id,
+                       shares=[models.ExpenseShare(group_id=group.id, member_id=users[i].id, amount=10.0)])
+        for i in range(size)
+    )
+    db.add_all(models.RecurringExpense(description="rent", amount=100.0, group_id=group.id,
+                                       start_date=datetime.date(2025, 1, 1), payer_id=users[0].id,
+                                       creator_id=users[0].id) for _ in range(3))
+    db.commit()
+    return group.id
+
+def count_queries(group_id):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        # Serializing with the route's response model triggers any lazy load it would
+        schemas.Group.model_validate(crud.get_group_detail(db, group_id), from_attributes=True)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+    return len(statements)
+
+@pytest.fixture(scope="module")
+def group_ids(fresh_db):
+    db = SessionLocal()
+    try:
+        return {size: seed_group(db, size) for size in SIZES}
+    finally:
+        db.close()
+
+def test_group_detail_query_count_does_not_grow(group_ids):
+    counts = {size: count_queries(group_id) for size, group_id in group_ids.items()}
+    assert len(set(counts.values())) == 1, f"queries per group size: {counts}"
+    assert counts[SIZES[0]] <= MAX_QUERIES